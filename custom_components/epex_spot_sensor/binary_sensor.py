@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from bisect import bisect_left, bisect_right
 from typing import Any
 
 from datetime import time, timedelta, datetime
@@ -17,7 +19,7 @@ from homeassistant.const import (
     ATTR_UNIT_OF_MEASUREMENT,
     CONF_ENTITY_ID,
 )
-from homeassistant.core import HomeAssistant, callback, Event
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback, Event
 from homeassistant.helpers import (
     config_validation as cv,
     device_registry as dr,
@@ -26,13 +28,17 @@ from homeassistant.helpers import (
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_time,
     async_track_state_change_event,
-    async_track_time_change,
 )
 
 from .const import (
     ATTR_DATA,
+    ATTR_PLAN,
     ATTR_RANK,
+    ATTR_RANKS,
+    ATTR_AVERAGE_PRICE,
     ATTR_INTERVAL_ENABLED,
     ATTR_START_TIME,
     ATTR_END_TIME,
@@ -49,19 +55,46 @@ from .const import (
     CONF_PRICE_TOLERANCE,
     CONF_DURATION_MODE,
     CONF_MIN_DURATION,
+    CONF_FLEXIBLE_OBJECTIVE,
+    DEFAULT_FLEXIBLE_OBJECTIVE,
+    CONF_MIN_RUN_LENGTH,
+    CONF_MAX_SEGMENTS,
     DEFAULT_PRICE_TOLERANCE,
+    DEFAULT_MAX_SEGMENTS,
+    CONF_RECORD_FULL_HISTORY,
+    DEFAULT_RECORD_FULL_HISTORY,
+    CONF_UPDATE_DELAY,
+    DEFAULT_UPDATE_DELAY,
 )
-from .util import (
-    get_marketdata_from_sensor_attrs,
-)
+from .marketdata_hub import async_get_marketdata_hub
 from .intermittent_interval import (
+    IntervalSchedule,
     calc_intervals_for_intermittent,
-    is_now_in_intervals,
+    coalesce_intervals,
 )
 from .contiguous_interval import calc_interval_for_contiguous
+from .util import calc_marketdata_fingerprint
 
 _LOGGER = logging.getLogger(__name__)
 
+# calculations estimated to take at least this time in microseconds run in the
+# executor if the result isn't cached yet, see
+# BinarySensor._estimate_calculation_time()
+EXECUTOR_MIN_TIME = 2000
+
+# calculation time per slot in microseconds by interval mode and flexible
+# duration, measured in CPython without NumPy
+SLOT_TIMES = {
+    (IntervalModes.CONTIGUOUS.value, False): 5,
+    (IntervalModes.CONTIGUOUS.value, True): 30,
+    (IntervalModes.INTERMITTENT.value, False): 2,
+    (IntervalModes.INTERMITTENT.value, True): 2,
+}
+
+# time per state of the run constraint program in microseconds, measured in
+# CPython without NumPy
+RUN_CONSTRAINT_STATE_TIME = 0.5
+
 DURATION_UOM_MAP = {
     "d": "days",
     "days": "days",
@@ -111,9 +144,17 @@ async def async_setup_entry(
     else:
         device_info = None
 
+    sensor_class = (
+        FullHistoryBinarySensor
+        if config_entry.options.get(
+            CONF_RECORD_FULL_HISTORY, DEFAULT_RECORD_FULL_HISTORY
+        )
+        else BinarySensor
+    )
+
     async_add_entities(
         [
-            BinarySensor(
+            sensor_class(
                 hass,
                 unique_id=config_entry.entry_id,
                 name=config_entry.title,
@@ -128,20 +169,81 @@ async def async_setup_entry(
                     CONF_PRICE_TOLERANCE, DEFAULT_PRICE_TOLERANCE
                 ),
                 duration_mode=config_entry.options.get(
-                    CONF_DURATION_MODE, DurationModes.EXACT
+                    CONF_DURATION_MODE, DurationModes.EXACT.value
                 ),
                 min_duration=config_entry.options.get(CONF_MIN_DURATION),
+                flexible_objective=config_entry.options.get(
+                    CONF_FLEXIBLE_OBJECTIVE, DEFAULT_FLEXIBLE_OBJECTIVE.value
+                ),
+                min_run_length=config_entry.options.get(CONF_MIN_RUN_LENGTH),
+                max_segments=config_entry.options.get(
+                    CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS
+                ),
+                update_delay=config_entry.options.get(
+                    CONF_UPDATE_DELAY, DEFAULT_UPDATE_DELAY
+                ),
                 device_info=device_info,
             )
         ]
     )
 
 
+def _calc_all(func, marketdata, calculations):
+    """Run func for each keyword arguments of calculations (in the executor)."""
+    return [func(marketdata, **kwargs) for kwargs in calculations]
+
+
+class DayPlan:
+    """Windows of a full state update, evaluated by scheduled updates.
+
+    Until the plan expires at the next window rollover, the state only
+    depends on the current time and the selected intervals, so scheduled
+    updates don't need to recalculate windows, duration or intervals.
+    """
+
+    __slots__ = (
+        "earliest_start",
+        "interval_start_time",
+        "latest_end",
+        "window_times",
+        "expires",
+    )
+
+    def __init__(
+        self,
+        earliest_start: datetime,
+        interval_start_time: datetime,
+        latest_end: datetime,
+        window_times: tuple,
+        now: datetime,
+    ):
+        self.earliest_start = earliest_start
+        self.interval_start_time = interval_start_time
+        self.latest_end = latest_end
+        self.window_times = window_times
+        # the windows move on at latest_end or midnight; the duration entity
+        # is evaluated differently once the window starts
+        self.expires = min(
+            t for t in (earliest_start, latest_end, window_times[-1]) if t > now
+        )
+
+    def is_valid(self, now: datetime) -> bool:
+        """Return True if the windows still apply at now."""
+        return now < self.expires
+
+    def is_enabled(self, now: datetime) -> bool:
+        """Return True if now is within the current window."""
+        return self.earliest_start <= now <= self.latest_end
+
+
 class BinarySensor(BinarySensorEntity):
     """Representation of a EPEX Spot binary sensor."""
 
     _attr_should_poll = False
 
+    # the plan is recorded in compact form only, see FullHistoryBinarySensor
+    _unrecorded_attributes = frozenset({ATTR_DATA, CONF_INTERVAL_START_TIME})
+
     def __init__(
         self,
         hass: HomeAssistant,
@@ -157,6 +259,10 @@ class BinarySensor(BinarySensorEntity):
         price_tolerance: float,
         duration_mode: str,
         min_duration: timedelta | None,
+        flexible_objective: str = DEFAULT_FLEXIBLE_OBJECTIVE.value,
+        min_run_length: timedelta | None = None,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+        update_delay: float = DEFAULT_UPDATE_DELAY,
         device_info: DeviceInfo | None = None,
     ) -> None:
         """Initialize the EPEX Spot binary sensor."""
@@ -174,26 +280,61 @@ class BinarySensor(BinarySensorEntity):
         self._price_mode = price_mode
         self._interval_mode = interval_mode
         self._price_tolerance = price_tolerance
-        self._duration_mode = duration_mode
-        self._min_duration = min_duration
+        self._default_duration_mode = duration_mode
+        self._default_min_duration = (
+            cv.time_period_dict(min_duration) if min_duration else None
+        )
+        self._flexible_objective = flexible_objective
+        self._min_run_length = (
+            cv.time_period_dict(min_run_length) if min_run_length else None
+        )
+        self._max_segments = int(max_segments)
+        self._update_delay = float(update_delay)
 
         # price sensor values
         self._sensor_attributes = None
-        self._cached_marketdata = []
+        self._marketdata_hub = async_get_marketdata_hub(hass)
 
         # calculated values
         self._duration: timedelta = self._default_duration
+        self._duration_mode: str = self._default_duration_mode
+        self._min_duration: timedelta | None = self._default_min_duration
         self._interval_start_time = None
         self._interval_enabled: bool = False
         self._state: bool | None = None
         self._intervals: list | None = None
 
+        # selected intervals of the current and next window, None if there
+        # are none
+        self._schedule: IntervalSchedule | None = None
+
+        # inputs of the last interval calculation
+        self._calculation_key: tuple | None = None
+
+        # windows of the last full update, None if it failed
+        self._day_plan: DayPlan | None = None
+
+        # state and attributes of the last write to the state machine
+        self._written_state: tuple | None = None
+
+        # interval calculation running in the executor and its inputs
+        self._pending_calculation: asyncio.Future | None = None
+        self._pending_calculation_key: tuple | None = None
+
+        self._unsub_scheduled_update: CALLBACK_TYPE | None = None
+        self._unsub_pending_update: CALLBACK_TYPE | None = None
+
+        # the duration entity changed since the last full update
+        self._duration_changed: bool = False
+
         @callback
         def async_update_state(
             event: Event,
         ) -> None:
             """Handle price or duration sensor state changes."""
-            self._update_state()
+            if event.data["entity_id"] == self._duration_entity_id:
+                self._duration_changed = True
+            self._schedule_pending_update()
 
         entities_to_track = [entity_id]
         if duration_entity_id is not None:
@@ -201,14 +342,13 @@ class BinarySensor(BinarySensorEntity):
         self.async_on_remove(
             async_track_state_change_event(hass, entities_to_track, async_update_state)
         )
-
-        # check every minute for new states
-        self.async_on_remove(
-            async_track_time_change(hass, async_update_state, second=0)
-        )
+        self.async_on_remove(self._cancel_scheduled_update)
+        self.async_on_remove(self._cancel_pending_update)
+        self.async_on_remove(self._cancel_pending_calculation)
 
     async def async_added_to_hass(self) -> None:
         """manually trigger first update"""
+        self.async_on_remove(self._marketdata_hub.async_subscribe(self._entity_id))
         self._update_state()
 
     @property
@@ -234,13 +374,133 @@ class BinarySensor(BinarySensorEntity):
             CONF_INTERVAL_MODE: self._interval_mode,
             ATTR_INTERVAL_ENABLED: self._interval_enabled,
             ATTR_DATA: self._intervals,
+            ATTR_PLAN: self._plan(),
         }
 
+    def _plan(self) -> list[list[int]]:
+        """Return the selected intervals as [start, end] epoch seconds."""
+        if self._schedule is None:
+            return []
+
+        return [
+            [int(start_time.timestamp()), int(end_time.timestamp())]
+            for start_time, end_time in self._schedule
+        ]
+
+    @callback
+    def _cancel_scheduled_update(self) -> None:
+        if self._unsub_scheduled_update is not None:
+            self._unsub_scheduled_update()
+            self._unsub_scheduled_update = None
+
+    @callback
+    def _async_scheduled_update(self, _now: datetime) -> None:
+        """Handle a scheduled switch time."""
+        self._unsub_scheduled_update = None
+
+        now = dt_util.now()
+        if self._day_plan is None or not self._day_plan.is_valid(now):
+            # window rollover
+            self._update_state()
+            return
+
+        self._update_state_from_plan(now)
+
+    @callback
+    def _update_state_from_plan(self, now: datetime) -> None:
+        """Update the state from the day plan, inputs are unchanged."""
+        plan = self._day_plan
+        self._interval_enabled = plan.is_enabled(now)
+        self._update_state_from_schedule(plan.interval_start_time, now)
+        self._schedule_next_update(now, plan.window_times)
+        self._async_write_state_if_changed()
+
+    @callback
+    def _cancel_pending_update(self) -> None:
+        if self._unsub_pending_update is not None:
+            self._unsub_pending_update()
+            self._unsub_pending_update = None
+
+    @callback
+    def _async_pending_update(self, _now: datetime | None = None) -> None:
+        """Handle coalesced sensor state changes."""
+        self._unsub_pending_update = None
+
+        now = dt_util.now()
+        if (
+            self._duration_changed
+            or self._day_plan is None
+            or not self._day_plan.is_valid(now)
+            or not self._is_marketdata_unchanged()
+        ):
+            self._update_state()
+            return
+
+        # the price sensor only ticked, its data is unchanged
+        self._update_state_from_plan(now)
+
+    def _is_marketdata_unchanged(self) -> bool:
+        """Return True if the price data equals the one of the last calculation.
+
+        A calculation running in the executor counts as a change.
+        """
+        if self._calculation_key is None or self._pending_calculation is not None:
+            return False
+
+        if (new_state := self._hass.states.get(self._entity_id)) is None:
+            return False
+
+        fingerprint = calc_marketdata_fingerprint(new_state.attributes.get("data"))
+        if fingerprint is None or fingerprint != self._calculation_key[0]:
+            return False
+
+        self._sensor_attributes = new_state.attributes
+        return True
+
+    @callback
+    def _schedule_pending_update(self) -> None:
+        """Coalesce sensor state changes into a single update.
+
+        The update runs in the next event loop iteration or after the update
+        delay, state changes until then don't schedule another one.
+        """
+        if self._unsub_pending_update is not None:
+            return
+
+        self._unsub_pending_update = async_call_later(
+            self._hass, self._update_delay, self._async_pending_update
+        )
+
+    @callback
+    def _schedule_next_update(self, now: datetime, window_times) -> None:
+        """Schedule an update at the next time the state may change."""
+        self._cancel_scheduled_update()
+
+        switch_times = window_times
+        if self._schedule is not None:
+            # the next time at which the state changes within the intervals
+            switch_times = (*window_times, self._schedule.next_transition(now))
+
+        next_time = min(
+            (t for t in switch_times if t is not None and t > now), default=None
+        )
+        if next_time is None:
+            return
+
+        self._unsub_scheduled_update = async_track_point_in_time(
+            self._hass, self._async_scheduled_update, next_time
+        )
+
     @callback
     def _update_state(self) -> None:
+        # this update covers all pending sensor state changes
+        self._cancel_pending_update()
+        self._duration_changed = False
+
         # set to unavailable by default
         self._sensor_attributes = None
         self._state = None
+        self._day_plan = None
 
         # get price sensor attributes first
         if (new_state := self._hass.states.get(self._entity_id)) is None:
@@ -277,40 +537,91 @@ class BinarySensor(BinarySensorEntity):
 
         self._interval_enabled = earliest_start <= now <= latest_end
         self._interval_start_time = earliest_start
-        self._interval_enabled = earliest_start <= now <= latest_end
-        self._interval_start_time = earliest_start
+
+        # the interval is enabled up to and including latest_end and moves on
+        # to the next day at latest_end or midnight
+        window_times = (
+            earliest_start,
+            latest_end,
+            latest_end + timedelta(seconds=1),
+            dt_util.start_of_local_day(now.date() + timedelta(days=1)),
+        )
 
         # calculate the actual duration (in case a duration entity is configured)
         self._calculate_duration()
 
-        if self._interval_mode == IntervalModes.INTERMITTENT.value:
+        marketdata = self._get_marketdata()
+        fingerprint = self._marketdata_hub.get_source(self._entity_id).fingerprint
+        calculation_key = (
+            fingerprint,
+            self._interval_start_time,
+            latest_end,
+            self._duration,
+            self._duration_mode,
+            self._min_duration,
+        )
+
+        if fingerprint is not None and calculation_key == self._calculation_key:
+            # neither market data nor schedule parameters changed, only the
+            # state depends on the current time
+            self._update_state_from_schedule(self._interval_start_time, now)
+        elif self._calculate_in_executor(
+            marketdata, self._interval_start_time, latest_end, calculation_key
+        ):
+            # keep the previous schedule until the calculation is done
+            self._update_state_from_schedule(self._interval_start_time, now)
+        elif self._interval_mode == IntervalModes.INTERMITTENT.value:
+            self._calculation_key = calculation_key
             self._update_state_for_intermittent(
-                self._interval_start_time, latest_end, now
+                marketdata, self._interval_start_time, latest_end, now
             )
         elif self._interval_mode == IntervalModes.CONTIGUOUS.value:
+            self._calculation_key = calculation_key
             self._update_state_for_contiguous(
-                self._interval_start_time, latest_end, now
+                marketdata, self._interval_start_time, latest_end, now
             )
         else:
             _LOGGER.error(f"invalid interval mode: {self._interval_mode}")
 
+        self._day_plan = DayPlan(
+            earliest_start, self._interval_start_time, latest_end, window_times, now
+        )
+        self._schedule_next_update(now, window_times)
+        self._async_write_state_if_changed()
+
+    @callback
+    def _async_write_state_if_changed(self) -> None:
+        """Write the state unless state and attributes equal the last write."""
+        written_state = (self._state, self.extra_state_attributes)
+        if written_state == self._written_state:
+            return
+
+        self._written_state = written_state
         self.async_write_ha_state()
 
+    def _update_state_from_schedule(self, earliest_start: datetime, now: datetime):
+        if self._schedule is None:
+            # no intervals found, probably because data for next day is missing
+            if now < earliest_start:
+                self._state = False
+                self._intervals = []
+            return
+
+        self._state = self._schedule.is_on(now)
+
     def _update_state_for_intermittent(
-        self, earliest_start: time, latest_end: time, now: datetime
+        self, marketdata, earliest_start: time, latest_end: time, now: datetime
     ):
-        marketdata = self._get_marketdata()
+        self._schedule = None
 
-        intervals = calc_intervals_for_intermittent(
-            marketdata=marketdata,
-            earliest_start=earliest_start,
-            latest_end=latest_end,
-            duration=self._duration,
-            most_expensive=self._price_mode == PriceModes.MOST_EXPENSIVE.value,
-            price_tolerance_percent=self._price_tolerance,
-            min_duration=self._min_duration
-            if self._duration_mode == DurationModes.FLEXIBLE.value
-            else None,
+        intervals = self._calc_intervals(
+            calc_intervals_for_intermittent,
+            marketdata,
+            earliest_start,
+            latest_end,
+            min_run_length=self._min_run_length,
+            max_segments=self._max_segments,
+            objective=self._flexible_objective,
         )
 
         if intervals is None:
@@ -321,53 +632,51 @@ class BinarySensor(BinarySensorEntity):
                 self._intervals = []
             return
 
-        self._state = is_now_in_intervals(now, intervals)
-
         # try to calculate intervals for next day also
+        intervals2 = None
         earliest_start += timedelta(days=1)
         if earliest_start >= latest_end:
             # do calculation only if latest_end is limited to 24h from earliest_start, # noqa: E501
             # --> avoid calculation if latest_end includes all available marketdata
             latest_end += timedelta(days=1)
-            intervals2 = calc_intervals_for_intermittent(
-                marketdata=marketdata,
-                earliest_start=earliest_start,
-                latest_end=latest_end,
-                duration=self._duration,
-                most_expensive=self._price_mode == PriceModes.MOST_EXPENSIVE.value,
-                price_tolerance_percent=self._price_tolerance,
-                min_duration=self._min_duration
-                if self._duration_mode == DurationModes.FLEXIBLE.value
-                else None,
+            intervals2 = self._calc_intervals(
+                calc_intervals_for_intermittent,
+                marketdata,
+                earliest_start,
+                latest_end,
+                min_run_length=self._min_run_length,
+                max_segments=self._max_segments,
+                objective=self._flexible_objective,
             )
 
-            if intervals2 is not None:
-                intervals = [*intervals, *intervals2]
+        # intervals of the next window start after the current window, so they
+        # don't affect the current state. The windows are ranked separately, so
+        # their intervals are not merged even if they are adjacent.
+        runs = coalesce_intervals(intervals)
+        if intervals2 is not None:
+            runs += coalesce_intervals(intervals2)
+
+        self._schedule = IntervalSchedule((e.start_time, e.end_time) for e in runs)
+        self._state = self._schedule.is_on(now)
 
         self._intervals = [
             {
                 ATTR_START_TIME: dt_util.as_local(e.start_time).isoformat(),
                 ATTR_END_TIME: dt_util.as_local(e.end_time).isoformat(),
                 ATTR_RANK: e.rank,
+                ATTR_RANKS: e.ranks,
+                ATTR_AVERAGE_PRICE: e.average_price,
             }
-            for e in sorted(intervals, key=lambda e: e.start_time)
+            for e in runs
         ]
 
     def _update_state_for_contiguous(
-        self, earliest_start: time, latest_end: time, now: datetime
+        self, marketdata, earliest_start: time, latest_end: time, now: datetime
     ):
-        marketdata = self._get_marketdata()
+        self._schedule = None
 
-        result = calc_interval_for_contiguous(
-            marketdata,
-            earliest_start=earliest_start,
-            latest_end=latest_end,
-            duration=self._duration,
-            most_expensive=self._price_mode == PriceModes.MOST_EXPENSIVE.value,
-            price_tolerance_percent=self._price_tolerance,
-            min_duration=self._min_duration
-            if self._duration_mode == DurationModes.FLEXIBLE.value
-            else None,
+        result = self._calc_intervals(
+            calc_interval_for_contiguous, marketdata, earliest_start, latest_end
         )
 
         if result is None:
@@ -378,10 +687,10 @@ class BinarySensor(BinarySensorEntity):
                 self._state = False
                 self._intervals = []
 
-            self.async_write_ha_state()
             return
 
         self._state = result["start"] <= now < result["end"]
+        self._schedule = IntervalSchedule([(result["start"], result["end"])])
 
         self._intervals = [
             {
@@ -397,21 +706,16 @@ class BinarySensor(BinarySensorEntity):
             # do calculation only if latest_end is limited to 24h from earliest_start,
             # --> avoid calculation if latest_end includes all available marketdata
             latest_end += timedelta(days=1)
-            result = calc_interval_for_contiguous(
-                marketdata,
-                earliest_start=earliest_start,
-                latest_end=latest_end,
-                duration=self._duration,
-                most_expensive=self._price_mode == PriceModes.MOST_EXPENSIVE.value,
-                price_tolerance_percent=self._price_tolerance,
-                min_duration=self._min_duration
-                if self._duration_mode == DurationModes.FLEXIBLE.value
-                else None,
+            result = self._calc_intervals(
+                calc_interval_for_contiguous, marketdata, earliest_start, latest_end
             )
 
             if result is None:
                 return
 
+            self._schedule = IntervalSchedule(
+                [*self._schedule, (result["start"], result["end"])]
+            )
             self._intervals.append(
                 {
                     ATTR_START_TIME: dt_util.as_local(result["start"]).isoformat(),
@@ -419,35 +723,179 @@ class BinarySensor(BinarySensorEntity):
                 }
             )
 
-    def _get_marketdata(self):
-        try:
-            marketdata = get_marketdata_from_sensor_attrs(self._sensor_attributes)
-        except KeyError as error:
-            _LOGGER.error(
-                f'Invalid price sensor "{self._entity_id}" selected for EPEX Spot Sensor "{self._attr_name}": {error}'  # noqa:E501
+    def _calc_intervals(
+        self,
+        func,
+        marketdata,
+        earliest_start: datetime,
+        latest_end: datetime,
+        **kwargs,
+    ):
+        """Run an interval calculation, memoized for equal market data.
+
+        Additional keyword arguments are passed to func.
+        """
+        return self._marketdata_hub.interval_cache.calc(
+            func, marketdata, **self._calc_kwargs(earliest_start, latest_end, **kwargs)
+        )
+
+    def _calc_kwargs(self, earliest_start: datetime, latest_end: datetime, **kwargs):
+        """Return the keyword arguments of an interval calculation."""
+        return {
+            "earliest_start": earliest_start,
+            "latest_end": latest_end,
+            "duration": self._duration,
+            "most_expensive": self._price_mode == PriceModes.MOST_EXPENSIVE.value,
+            "price_tolerance_percent": self._price_tolerance,
+            "min_duration": (
+                self._min_duration
+                if self._duration_mode == DurationModes.FLEXIBLE.value
+                else None
+            ),
+            **kwargs,
+        }
+
+    @callback
+    def _calculate_in_executor(
+        self,
+        marketdata,
+        earliest_start: datetime,
+        latest_end: datetime,
+        calculation_key: tuple,
+    ) -> bool:
+        """Start the interval calculation in the executor if it is large.
+
+        Returns True if the result is pending. Once it is available, it is
+        stored in the interval cache and the state is updated again. A
+        calculation for outdated inputs is cancelled and its result dropped.
+        """
+        if calculation_key == self._pending_calculation_key:
+            return True
+
+        self._cancel_pending_calculation()
+
+        # results without fingerprint can't be handed over through the
+        # interval cache
+        if getattr(marketdata, "fingerprint", None) is None:
+            return False
+
+        if self._interval_mode == IntervalModes.INTERMITTENT.value:
+            func = calc_intervals_for_intermittent
+            extra_kwargs = {
+                "min_run_length": self._min_run_length,
+                "max_segments": self._max_segments,
+                "objective": self._flexible_objective,
+            }
+        elif self._interval_mode == IntervalModes.CONTIGUOUS.value:
+            func = calc_interval_for_contiguous
+            extra_kwargs = {}
+        else:
+            return False
+
+        # the current window and the next one, see _update_state_for_*()
+        windows = [(earliest_start, latest_end)]
+        if earliest_start + timedelta(days=1) >= latest_end:
+            windows.append(
+                (earliest_start + timedelta(days=1), latest_end + timedelta(days=1))
             )
-            return []
 
-        # now merge it with the cached info
-        marketdata = [*marketdata, *self._cached_marketdata]
+        # small calculations run inline
+        if self._estimate_calculation_time(marketdata, windows) < EXECUTOR_MIN_TIME:
+            return False
 
-        # remove outdated entries (exact time doesn't matter)
-        start_time = dt_util.now() - timedelta(days=1)
-        marketdata = filter(lambda e: e.start_time >= start_time, marketdata)
+        interval_cache = self._marketdata_hub.interval_cache
+        calculations = []
+        for window in windows:
+            kwargs = self._calc_kwargs(*window, **extra_kwargs)
+            if not interval_cache.contains(func, marketdata, **kwargs):
+                calculations.append(kwargs)
+        if not calculations:
+            return False
 
-        # eliminate duplicates
-        dummy = {e.start_time: e for e in marketdata}
+        @callback
+        def async_calculation_done(future: asyncio.Future) -> None:
+            if future is not self._pending_calculation:
+                # cancelled or replaced by a calculation for newer inputs
+                return
 
-        # sort by start_time again
-        marketdata = sorted(dummy.values(), key=lambda e: e.start_time)
+            self._pending_calculation = None
+            self._pending_calculation_key = None
 
-        self._cached_marketdata = marketdata
+            if (error := future.exception()) is not None:
+                _LOGGER.error("Interval calculation failed: %s", error)
+                return
 
-        return marketdata
+            for kwargs, result in zip(calculations, future.result()):
+                interval_cache.store(result, func, marketdata, **kwargs)
+            self._update_state()
+
+        self._pending_calculation_key = calculation_key
+        self._pending_calculation = self._hass.async_add_executor_job(
+            _calc_all, func, marketdata, calculations
+        )
+        self._pending_calculation.add_done_callback(async_calculation_done)
+        return True
+
+    def _estimate_calculation_time(self, marketdata, windows) -> float:
+        """Return the estimated calculation time for windows in microseconds.
+
+        The run constraint program costs one state per cell, run count and
+        number of selected cells, see _select_intervals_with_run_constraints().
+        The slots are taken as cells. The other calculations cost a fixed time
+        per slot.
+        """
+        run_constraints = self._interval_mode == IntervalModes.INTERMITTENT.value and (
+            self._min_run_length or self._max_segments
+        )
+        flexible = (
+            self._duration_mode == DurationModes.FLEXIBLE.value
+            and self._min_duration is not None
+        )
+
+        estimate = 0.0
+        for earliest_start, latest_end in windows:
+            first = bisect_right(marketdata.end_timestamps, earliest_start.timestamp())
+            stop = bisect_left(marketdata.start_timestamps, latest_end.timestamp())
+            slots = stop - first
+            if slots <= 0:
+                continue
+
+            if not run_constraints:
+                estimate += SLOT_TIMES[self._interval_mode, flexible] * slots
+                continue
+
+            # selected cells of the mean slot length
+            slot_length = (
+                marketdata.end_timestamps[stop - 1] - marketdata.start_timestamps[first]
+            ) / slots
+            needed = min(self._duration.total_seconds() / slot_length, slots)
+            runs = min(self._max_segments, needed) + 1 if self._max_segments else 1
+            estimate += RUN_CONSTRAINT_STATE_TIME * slots * runs * (needed + 1)
+
+        return estimate
+
+    @callback
+    def _cancel_pending_calculation(self) -> None:
+        if self._pending_calculation is not None:
+            self._pending_calculation.cancel()
+            self._pending_calculation = None
+            self._pending_calculation_key = None
+
+    def _get_marketdata(self):
+        try:
+            return self._marketdata_hub.get_source(self._entity_id).get_marketdata(
+                self._sensor_attributes
+            )
+        except KeyError as error:
+            _LOGGER.error(
+                f'Invalid price sensor "{self._entity_id}" selected for EPEX Spot Sensor "{self._attr_name}": {error}'  # noqa:E501
+            )
+            return []
 
     def _calculate_duration(self):
         self._duration = self._default_duration
-        self._min_duration = None  # Reset flexible settings
+        self._duration_mode = self._default_duration_mode
+        self._min_duration = self._default_min_duration
 
         if self._duration_entity_id is None:
             return
@@ -479,3 +927,9 @@ class BinarySensor(BinarySensorEntity):
             and duration_entity_state.last_changed > self._interval_start_time
         ):
             self._interval_start_time = duration_entity_state.last_changed
+
+
+class FullHistoryBinarySensor(BinarySensor):
+    """EPEX Spot binary sensor which records all attributes."""
+
+    _unrecorded_attributes = frozenset()
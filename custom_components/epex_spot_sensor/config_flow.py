@@ -21,6 +21,7 @@ from .const import (
     PriceModes,
     IntervalModes,
     DurationModes,
+    FlexibleObjectives,
     CONF_EARLIEST_START_TIME,
     CONF_LATEST_END_TIME,
     CONF_INTERVAL_MODE,
@@ -31,6 +32,15 @@ from .const import (
     DEFAULT_PRICE_TOLERANCE,
     CONF_DURATION_MODE,
     CONF_MIN_DURATION,
+    CONF_FLEXIBLE_OBJECTIVE,
+    DEFAULT_FLEXIBLE_OBJECTIVE,
+    CONF_MIN_RUN_LENGTH,
+    CONF_MAX_SEGMENTS,
+    DEFAULT_MAX_SEGMENTS,
+    CONF_RECORD_FULL_HISTORY,
+    DEFAULT_RECORD_FULL_HISTORY,
+    CONF_UPDATE_DELAY,
+    DEFAULT_UPDATE_DELAY,
     DOMAIN,
 )
 
@@ -40,7 +50,7 @@ OPTIONS_SCHEMA = vol.Schema(
         vol.Required(CONF_EARLIEST_START_TIME): selector.TimeSelector(),
         vol.Required(CONF_LATEST_END_TIME): selector.TimeSelector(),
         vol.Required(
-            CONF_DURATION_MODE, default=DurationModes.EXACT
+            CONF_DURATION_MODE, default=DurationModes.EXACT.value
         ): selector.SelectSelector(
             selector.SelectSelectorConfig(
                 translation_key=CONF_DURATION_MODE,
@@ -53,8 +63,17 @@ OPTIONS_SCHEMA = vol.Schema(
             selector.EntitySelectorConfig(domain=[INPUT_NUMBER_DOMAIN, SENSOR_DOMAIN])
         ),
         vol.Optional(CONF_MIN_DURATION): selector.DurationSelector(),
+        vol.Optional(
+            CONF_FLEXIBLE_OBJECTIVE, default=DEFAULT_FLEXIBLE_OBJECTIVE.value
+        ): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                translation_key=CONF_FLEXIBLE_OBJECTIVE,
+                mode=selector.SelectSelectorMode.LIST,
+                options=[e.value for e in FlexibleObjectives],
+            )
+        ),
         vol.Required(
-            CONF_PRICE_MODE, default=PriceModes.CHEAPEST
+            CONF_PRICE_MODE, default=PriceModes.CHEAPEST.value
         ): selector.SelectSelector(
             selector.SelectSelectorConfig(
                 translation_key=CONF_PRICE_MODE,
@@ -63,7 +82,7 @@ OPTIONS_SCHEMA = vol.Schema(
             )
         ),
         vol.Required(
-            CONF_INTERVAL_MODE, default=IntervalModes.INTERMITTENT
+            CONF_INTERVAL_MODE, default=IntervalModes.INTERMITTENT.value
         ): selector.SelectSelector(
             selector.SelectSelectorConfig(
                 translation_key=CONF_INTERVAL_MODE,
@@ -71,6 +90,16 @@ OPTIONS_SCHEMA = vol.Schema(
                 options=[e.value for e in IntervalModes],
             )
         ),
+        vol.Optional(CONF_MIN_RUN_LENGTH): selector.DurationSelector(),
+        vol.Optional(
+            CONF_MAX_SEGMENTS, default=DEFAULT_MAX_SEGMENTS
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                mode=selector.NumberSelectorMode.BOX,
+                min=0,
+                step=1,
+            ),
+        ),
         vol.Optional(
             CONF_PRICE_TOLERANCE, default=DEFAULT_PRICE_TOLERANCE
         ): selector.NumberSelector(
@@ -82,6 +111,20 @@ OPTIONS_SCHEMA = vol.Schema(
                 unit_of_measurement="%",
             ),
         ),
+        vol.Optional(
+            CONF_RECORD_FULL_HISTORY, default=DEFAULT_RECORD_FULL_HISTORY
+        ): selector.BooleanSelector(),
+        vol.Optional(
+            CONF_UPDATE_DELAY, default=DEFAULT_UPDATE_DELAY
+        ): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                mode=selector.NumberSelectorMode.BOX,
+                min=0,
+                max=60,
+                step="any",
+                unit_of_measurement="s",
+            ),
+        ),
         #        vol.Required(
         #            CONF_HYSTERESIS, default=DEFAULT_HYSTERESIS
         #        ): selector.NumberSelector(
@@ -18,6 +18,16 @@ DEFAULT_PRICE_TOLERANCE = 0.0
 CONF_DURATION_MODE = "duration_mode"
 CONF_MIN_DURATION = "min_duration"
 
+CONF_MIN_RUN_LENGTH = "min_run_length"
+CONF_MAX_SEGMENTS = "max_segments"
+DEFAULT_MAX_SEGMENTS = 0  # unlimited
+
+CONF_RECORD_FULL_HISTORY = "record_full_history"
+DEFAULT_RECORD_FULL_HISTORY = False
+
+CONF_UPDATE_DELAY = "update_delay"
+DEFAULT_UPDATE_DELAY = 0  # seconds, 0 = next event loop iteration
+
 
 class DurationModes(Enum):
     """Duration modes for config validation."""
@@ -28,6 +38,18 @@ class DurationModes(Enum):
 
 DEFAULT_DURATION_MODE = DurationModes.EXACT
 
+CONF_FLEXIBLE_OBJECTIVE = "flexible_objective"
+
+
+class FlexibleObjectives(Enum):
+    """Objectives for choosing the duration in flexible mode."""
+
+    AVERAGE_PRICE = "average_price"
+    TOTAL_COST = "total_cost"
+
+
+DEFAULT_FLEXIBLE_OBJECTIVE = FlexibleObjectives.AVERAGE_PRICE
+
 
 class IntervalModes(Enum):
     """Work modes for config validation."""
@@ -50,4 +72,7 @@ ATTR_INTERVAL_ENABLED = "enabled"
 ATTR_START_TIME = "start_time"
 ATTR_END_TIME = "end_time"
 ATTR_RANK = "rank"
+ATTR_RANKS = "ranks"
+ATTR_AVERAGE_PRICE = "average_price"
 ATTR_DATA = "data"
+ATTR_PLAN = "plan"
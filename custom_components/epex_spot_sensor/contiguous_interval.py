@@ -1,168 +1,481 @@
+import heapq
 import logging
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 
+from . import vectorized
+from .util import (
+    MICROSECONDS_PER_SECOND,
+    ONE_MICROSECOND,
+    SlotLocator,
+    create_slot_locator,
+    from_epoch_us,
+    marketdata_to_epoch_us,
+    to_epoch_us,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 SECONDS_PER_HOUR = 60 * 60
 
+# relative slack used when comparing window prices, so that rounding noise of
+# the cumulative sums doesn't override the "earliest start wins" tie-breaker
+PRICE_EPSILON = 1e-9
 
-def _find_market_price(marketdata, dt: datetime):
-    for mp in marketdata:
-        if dt >= mp.start_time and dt < mp.end_time:
-            return mp
 
-    return None
+class _PriceIndex:
+    """Cumulative cost index over time-sorted market data.
 
+    The price of any window is calculated with two bisect lookups (for the
+    partial first and last slot) and a difference of cumulative costs, instead
+    of walking the market data segment by segment.
 
-def _calc_interval_price(marketdata, start_time: datetime, duration: timedelta):
-    """Calculate price for given start time and duration."""
-    total_price = 0
-    stop_time = start_time + duration
+    All times and durations are integer microseconds since the epoch.
+    """
 
-    while start_time < stop_time:
-        mp = _find_market_price(marketdata, start_time)
+    def __init__(self, start_times, end_times, prices, locator=None):
+        self._start_times = start_times
+        self._end_times = end_times
+        self._prices = prices
+        self._locator = locator or SlotLocator(start_times, end_times)
+
+        # _costs[i] is the accumulated cost of all slots before slot i,
+        # _gaps[i] is the number of holes in the market data before slot i
+        self._costs = [0.0]
+        self._gaps = [0]
+        for i, price in enumerate(prices):
+            self._costs.append(
+                self._costs[-1]
+                + price
+                * ((end_times[i] - start_times[i]) / MICROSECONDS_PER_SECOND)
+                / SECONDS_PER_HOUR
+            )
+            if i > 0:
+                gap = start_times[i] != end_times[i - 1]
+                self._gaps.append(self._gaps[-1] + gap)
 
-        if mp is None:
-            return None
+    def interval_price(self, start_time: int, duration: int):
+        """Calculate price for given start time and duration.
 
-        if mp.end_time > stop_time:
-            active_duration_in_this_segment = stop_time - start_time
-        else:
-            active_duration_in_this_segment = mp.end_time - start_time
+        Returns None if the market data doesn't cover the whole interval.
+        """
+        stop_time = start_time + duration
 
-        total_price += (
-            mp.price
-            * active_duration_in_this_segment.total_seconds()
-            / SECONDS_PER_HOUR
+        # slot containing start_time
+        first = self._locator.start_right(start_time) - 1
+        # slot containing the last moment before stop_time
+        last = self._locator.end_left(stop_time)
+
+        return self._window_price(max(first, 0), last, start_time, stop_time)
+
+    def iter_interval_prices(self, start_times, duration: int):
+        """Yield (start_time, price) for all sorted start times.
+
+        Both edges of the window only move forward, therefore the slots
+        containing them are tracked by two pointers instead of being looked
+        up for every start time. Walking all candidates costs
+        O(slots + candidates).
+        """
+        count = len(self._end_times)
+        first = 0
+        last = 0
+
+        for start_time in start_times:
+            stop_time = start_time + duration
+
+            # advance to the first slot ending after start_time
+            while first < count and self._end_times[first] <= start_time:
+                first += 1
+
+            # advance to the first slot ending at or after stop_time
+            while last < count and self._end_times[last] < stop_time:
+                last += 1
+
+            yield start_time, self._window_price(first, last, start_time, stop_time)
+
+    def start_position(self, start_time: int):
+        """Return (cumulative cost, run) at start_time or None if not covered.
+
+        A run is a gap-free sequence of slots; windows can't span two runs.
+        """
+        i = self._locator.start_right(start_time) - 1
+        if i < 0 or start_time >= self._end_times[i]:
+            return None
+
+        return (
+            self._costs[i]
+            + self._prices[i]
+            * ((start_time - self._start_times[i]) / MICROSECONDS_PER_SECOND)
+            / SECONDS_PER_HOUR,
+            self._gaps[i],
         )
 
-        start_time = mp.end_time
+    def breakpoints(self, latest_end: int):
+        """Return slot boundaries up to latest_end as (times, costs, runs).
+
+        latest_end itself is included if it is covered by market data.
+        """
+        times = []
+        costs = []
+        runs = []
+
+        for i in range(self._locator.start_left(latest_end)):
+            start_time = self._start_times[i]
+
+            if not times or times[-1] != start_time:
+                times.append(start_time)
+                costs.append(self._costs[i])
+                runs.append(self._gaps[i])
+
+            end_time = min(self._end_times[i], latest_end)
+            times.append(end_time)
+            costs.append(
+                self._costs[i]
+                + self._prices[i]
+                * ((end_time - start_time) / MICROSECONDS_PER_SECOND)
+                / SECONDS_PER_HOUR
+            )
+            runs.append(self._gaps[i])
 
-    return total_price
+        return times, costs, runs
 
+    def _window_price(self, first: int, last: int, start_time: int, stop_time: int):
+        """Calculate the window price from the slots containing its edges."""
+        if stop_time <= start_time:
+            return 0
 
-def _calc_start_times(
-    marketdata, earliest_start: datetime, latest_end: datetime, duration: timedelta
-):
-    """Calculate list of meaningful start times."""
-    start_times = set()
-    start_time = earliest_start
+        if first == len(self._start_times) or start_time < self._start_times[first]:
+            return None
 
-    # add earliest possible start (if duration matches)
-    if earliest_start + duration <= latest_end:
-        start_times.add(earliest_start)
+        if start_time >= self._end_times[first]:
+            return None
 
-    for md in marketdata:
-        # add start times for market data segment start
-        if md.start_time >= earliest_start and md.start_time + duration <= latest_end:
-            start_times.add(md.start_time)
+        if last == len(self._end_times) or self._start_times[last] >= stop_time:
+            return None
 
-        # add start times for market data segment end
-        start_time = md.end_time - duration
-        if md.end_time <= latest_end and earliest_start <= start_time:
-            start_times.add(start_time)
+        if self._gaps[last] != self._gaps[first]:
+            return None
 
-    # add latest possible start (if duration matches)
-    start_time = latest_end - duration
-    if earliest_start <= start_time:
-        start_times.add(start_time)
+        if first == last:
+            return (
+                self._prices[first]
+                * ((stop_time - start_time) / MICROSECONDS_PER_SECOND)
+                / SECONDS_PER_HOUR
+            )
 
-    return sorted(start_times)
+        return (
+            self._prices[first]
+            * ((self._end_times[first] - start_time) / MICROSECONDS_PER_SECOND)
+            / SECONDS_PER_HOUR
+            + self._costs[last]
+            - self._costs[first + 1]
+            + self._prices[last]
+            * ((stop_time - self._start_times[last]) / MICROSECONDS_PER_SECOND)
+            / SECONDS_PER_HOUR
+        )
 
 
-def _calc_flexible_start_times(
-    marketdata,
-    earliest_start: datetime,
-    latest_end: datetime,
-    min_duration: timedelta,
-    max_duration: timedelta,
+class _LowerHullTree:
+    """Segment tree of lower convex hulls over a static, x-sorted point set.
+
+    Answers "which point in the index range [lo, hi) is seen under the
+    minimum slope from a query point left of all of them" in O(log² n).
+    """
+
+    def __init__(self, xs, ys):
+        self._xs = xs
+        self._ys = ys
+        self._size = 1
+        while self._size < len(xs):
+            self._size *= 2
+
+        self._hulls = [[] for _ in range(2 * self._size)]
+        for i in range(len(xs)):
+            self._hulls[self._size + i] = [i]
+        for node in range(self._size - 1, 0, -1):
+            self._hulls[node] = self._lower_hull(
+                [*self._hulls[2 * node], *self._hulls[2 * node + 1]]
+            )
+
+    def _lower_hull(self, points):
+        xs = self._xs
+        ys = self._ys
+        hull = []
+        for p in points:
+            while len(hull) >= 2:
+                o = hull[-2]
+                a = hull[-1]
+                cross = (xs[a] - xs[o]) * (ys[p] - ys[o]) - (ys[a] - ys[o]) * (
+                    xs[p] - xs[o]
+                )
+                if cross > 0:
+                    break
+                hull.pop()
+            hull.append(p)
+        return hull
+
+    def _slope(self, qx: float, qy: float, p: int):
+        return (self._ys[p] - qy) / (self._xs[p] - qx)
+
+    def _tangent(self, hull, qx: float, qy: float):
+        # slopes from q along a lower hull decrease, then increase
+        lo = 0
+        hi = len(hull) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._slope(qx, qy, hull[mid + 1]) < self._slope(qx, qy, hull[mid]):
+                lo = mid + 1
+            else:
+                hi = mid
+        return hull[lo]
+
+    def query(self, lo: int, hi: int, qx: float, qy: float):
+        """Return the index in [lo, hi) with minimum slope from (qx, qy).
+
+        Ties are resolved to the lowest index.
+        """
+        best = None
+        best_slope = None
+
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            nodes = []
+            if lo & 1:
+                nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                nodes.append(hi)
+            for node in nodes:
+                p = self._tangent(self._hulls[node], qx, qy)
+                slope = self._slope(qx, qy, p)
+                if _is_better(slope, best_slope, False) or (
+                    not _is_better(best_slope, slope, False) and p < best
+                ):
+                    best = p
+                    best_slope = slope
+            lo //= 2
+            hi //= 2
+
+        return best
+
+
+def _is_better(price: float, reference: float | None, most_expensive: bool):
+    """Check if price is strictly better than reference (ignoring rounding)."""
+    if reference is None:
+        return True
+
+    epsilon = PRICE_EPSILON * max(1.0, abs(reference))
+    if most_expensive:
+        return price > reference + epsilon
+    return price < reference - epsilon
+
+
+def _merge_unique(*iterables):
+    """Merge ascending iterables into one ascending stream without duplicates."""
+    previous = None
+    for value in heapq.merge(*iterables):
+        if value != previous:
+            yield value
+            previous = value
+
+
+def _iter_start_times(
+    slot_start_times,
+    slot_end_times,
+    earliest_start: int,
+    latest_end: int,
+    duration: int,
+    locator: SlotLocator | None = None,
 ):
-    """Calculate meaningful start times for flexible duration range."""
-    start_times = set()
+    """Yield meaningful start times in ascending order.
 
-    # Candidates for min_duration
-    min_candidates = _calc_start_times(
-        marketdata, earliest_start, latest_end, min_duration
+    These are the window limits, slot starts and slot ends shifted back by
+    duration. Both slot sequences are sorted, so the limits of the window are
+    located by bisection and the sequences are merged lazily, which costs
+    O(window slots).
+    """
+    latest_start = latest_end - duration
+    if latest_start < earliest_start:
+        return
+
+    if locator is None:
+        locator = SlotLocator(slot_start_times, slot_end_times)
+
+    # slots starting within [earliest_start, latest_start]
+    starts = (
+        slot_start_times[i]
+        for i in range(
+            locator.start_left(earliest_start), locator.start_right(latest_start)
+        )
     )
-
-    # Candidates for max_duration
-    max_candidates = _calc_start_times(
-        marketdata, earliest_start, latest_end, max_duration
+    # slots ending within [earliest_start + duration, latest_end]
+    ends = (
+        slot_end_times[i] - duration
+        for i in range(
+            locator.end_left(earliest_start + duration), locator.end_right(latest_end)
+        )
     )
 
-    # Combine
-    start_times.update(min_candidates)
-    start_times.update(max_candidates)
+    yield from _merge_unique((earliest_start,), starts, ends, (latest_start,))
 
-    return sorted(list(set(start_times)))
 
-
-def _find_extreme_price_interval(
-    marketdata,
-    start_times,
-    duration: timedelta,
-    most_expensive: bool = False,
-    price_tolerance_percent: float = 0.0,
+def _iter_flexible_start_times(
+    slot_start_times,
+    slot_end_times,
+    earliest_start: int,
+    latest_end: int,
+    min_duration: int,
+    max_duration: int,
+    locator: SlotLocator | None = None,
 ):
-    """Find the lowest/highest price for all given start times.
+    """Yield meaningful start times for flexible duration range in order."""
+    if locator is None:
+        locator = SlotLocator(slot_start_times, slot_end_times)
+
+    yield from _merge_unique(
+        _iter_start_times(
+            slot_start_times,
+            slot_end_times,
+            earliest_start,
+            latest_end,
+            min_duration,
+            locator,
+        ),
+        _iter_start_times(
+            slot_start_times,
+            slot_end_times,
+            earliest_start,
+            latest_end,
+            max_duration,
+            locator,
+        ),
+    )
+
 
-        The argument cmp is a lambda which is used to differentiate between
-    lowest and highest price.
+def _calc_candidates(price_index: _PriceIndex, start_times, duration: int):
+    """Price all given start times for a fixed duration.
 
     Args:
-        marketdata: Market price data
-        start_times: List of candidate start times
-        duration: Duration of the interval
-        most_expensive: If True, find most expensive; otherwise find cheapest
-        price_tolerance_percent: Price tolerance percentage (0.0 = no tolerance)
+        price_index: Cumulative cost index of the market data
+        start_times: Ascending candidate start times (epoch microseconds)
+        duration: Duration of the interval in microseconds
 
     Returns:
-        Dict with start, end, interval_price, price_per_hour, or None if no valid interval
+        List of dicts with start, end (epoch microseconds), interval_price,
+        price_per_hour, sorted by start time
     """
-    interval_price: float | None = None
-    interval_start_time: timedelta | None = None
+    candidates = []
+    for start, price in price_index.iter_interval_prices(start_times, duration):
+        if price is None:
+            continue
 
-    if most_expensive:
+        candidates.append(
+            {
+                "start": start,
+                "end": start + duration,
+                "interval_price": price,
+                "price_per_hour": price
+                * SECONDS_PER_HOUR
+                / (duration / MICROSECONDS_PER_SECOND),
+            }
+        )
 
-        def cmp(a, b):
-            return a > b
+    return candidates
 
-    else:
 
-        def cmp(a, b):
-            return a < b
+def _calc_flexible_candidates(
+    price_index: _PriceIndex,
+    start_times,
+    min_duration: int,
+    max_duration: int,
+    latest_end: int,
+    most_expensive: bool = False,
+):
+    """Find the best interval within flexible duration range per start time.
+
+    All windows are considered whose edges are aligned to a slot boundary,
+    to the given limits, or min_duration/max_duration away from one of them.
+    This always includes the optimum, because the price per hour of a window
+    is monotonic while none of its edges crosses a slot boundary.
+
+    For every start time, the best end on a slot boundary is found by a
+    tangent query on the convex hull of the cumulative cost curve instead
+    of trying every possible duration.
+
+    Returns:
+        List of dicts with start, end (epoch microseconds), interval_price,
+        price_per_hour, sorted by start time
+    """
+    times, costs, runs = price_index.breakpoints(latest_end)
+    if len(times) == 0:
+        return []
+
+    # search minimum slope of the cumulative cost curve, mirrored for
+    # most expensive mode
+    sign = -1 if most_expensive else 1
+    origin = times[0]
+    hull_tree = _LowerHullTree(
+        [(t - origin) / MICROSECONDS_PER_SECOND for t in times],
+        [sign * c for c in costs],
+    )
+
+    candidates = []
 
-    # Find optimal interval (cheapest or most expensive)
     for start in start_times:
-        price = _calc_interval_price(marketdata, start, duration)
-        if price is None:
+        if start + min_duration > latest_end:
             continue
 
-        if interval_price is None or (
-            price > interval_price if most_expensive else price < interval_price
-        ):
-            interval_price = price
-            interval_start_time = start
+        position = price_index.start_position(start)
+        if position is None:
+            continue
+        cost, run = position
+
+        end_times = {start + min_duration, min(start + max_duration, latest_end)}
+
+        # slot boundaries within duration range, limited to the run of start
+        lo = max(bisect_left(times, start + min_duration), bisect_left(runs, run))
+        hi = min(bisect_right(times, start + max_duration), bisect_right(runs, run))
+        if lo < hi:
+            end_times.add(
+                times[
+                    hull_tree.query(
+                        lo, hi, (start - origin) / MICROSECONDS_PER_SECOND, sign * cost
+                    )
+                ]
+            )
 
-    if interval_start_time is None or interval_price is None:
-        return None
+        # prefer shorter duration for equal price per hour
+        result = None
+        for end in sorted(end_times):
+            price = price_index.interval_price(start, end - start)
+            if price is None:
+                continue
 
-    # Build optimal result
-    optimal_result = {
-        "start": interval_start_time,
-        "end": interval_start_time + duration,
-        "interval_price": interval_price,
-        "price_per_hour": interval_price * SECONDS_PER_HOUR / duration.total_seconds(),
-    }
+            price_per_hour = (
+                price * SECONDS_PER_HOUR / ((end - start) / MICROSECONDS_PER_SECOND)
+            )
+            if result is None or _is_better(
+                price_per_hour, result["price_per_hour"], most_expensive
+            ):
+                result = {
+                    "start": start,
+                    "end": end,
+                    "interval_price": price,
+                    "price_per_hour": price_per_hour,
+                }
 
-    # If tolerance is 0, return optimal (backward compatibility)
-    if price_tolerance_percent == 0.0:
-        return optimal_result
+        if result is not None:
+            candidates.append(result)
+
+    return candidates
 
-    # Calculate price threshold based on optimal price
-    price_per_hour = optimal_result["price_per_hour"]
 
+def _within_tolerance(
+    price_per_hour: float, most_expensive: bool, price_tolerance_percent: float
+):
+    """Return a test for prices within the tolerance of the optimal price."""
     if most_expensive:
         # For most expensive mode, threshold is lower bound
         threshold = price_per_hour * (1 - price_tolerance_percent / 100)
@@ -177,166 +490,132 @@ def _find_extreme_price_interval(
         def within_threshold(price):
             return price <= threshold
 
-    # Find all intervals within threshold
-    candidates = []
-    for start in start_times:
-        price = _calc_interval_price(marketdata, start, duration)
-        if price is None:
-            continue
-
-        price_per_hour_candidate = price * SECONDS_PER_HOUR / duration.total_seconds()
-
-        if within_threshold(price_per_hour_candidate):
-            candidates.append(
-                {
-                    "start": start,
-                    "end": start + duration,
-                    "interval_price": price,
-                    "price_per_hour": price_per_hour_candidate,
-                }
-            )
-
-    # If no candidates within threshold, fall back to optimal
-    if len(candidates) == 0:
-        _LOGGER.warning(
-            "No intervals found within price tolerance (%.1f%%), "
-            "using optimal interval",
-            price_tolerance_percent,
-        )
-        return optimal_result
-
-    # Prefer earliest start time (Decision 3)
-    candidates.sort(key=lambda x: x["start"])
-    return candidates[0]
+    return within_threshold
 
 
-def _find_flexible_extreme_price_interval(
-    marketdata,
-    start_times,
-    min_duration: timedelta,
-    max_duration: timedelta,
-    latest_end: datetime,
+def _select_candidate(
+    candidates,
     most_expensive: bool = False,
     price_tolerance_percent: float = 0.0,
 ):
-    """Find best interval within flexible duration range."""
-
-    best_result = None
-    best_price_per_hour = None
+    """Select the interval from a start-sorted candidate table.
 
-    # Define test durations
-    test_durations = [
-        min_duration,
-        max_duration,
-    ]
-    # Add midpoint if significantly different
-    if max_duration > min_duration * 2:
-        midpoint = min_duration + (max_duration - min_duration) / 2
-        test_durations.append(midpoint)
-
-    # For each candidate start time
-    for start in start_times:
-        for test_duration in test_durations:
-            if start + test_duration > latest_end:
-                continue
+    Without tolerance, the cheapest/most expensive candidate is selected
+    (earliest start for equal prices). With tolerance, the earliest candidate
+    within the threshold is selected; if there is none, the optimal one.
+    """
+    optimal_result = None
+    for candidate in candidates:
+        if optimal_result is None or _is_better(
+            candidate["price_per_hour"],
+            optimal_result["price_per_hour"],
+            most_expensive,
+        ):
+            optimal_result = candidate
 
-            price = _calc_interval_price(marketdata, start, test_duration)
-            if price is None:
-                continue
+    if optimal_result is None:
+        return None
 
-            price_per_hour = price * SECONDS_PER_HOUR / test_duration.total_seconds()
+    # If tolerance is 0, return optimal (backward compatibility)
+    if price_tolerance_percent == 0.0:
+        return optimal_result
 
-            # Check if this is better than current best
-            is_better = best_price_per_hour is None or (
-                price_per_hour < best_price_per_hour
-                if not most_expensive
-                else price_per_hour > best_price_per_hour
-            )
+    # Calculate price threshold based on optimal price
+    within_threshold = _within_tolerance(
+        optimal_result["price_per_hour"], most_expensive, price_tolerance_percent
+    )
 
-            if is_better:
-                best_result = {
-                    "start": start,
-                    "end": start + test_duration,
-                    "interval_price": price,
-                    "price_per_hour": price_per_hour,
-                }
-                best_price_per_hour = price_per_hour
+    # Prefer earliest start time (Decision 3)
+    for candidate in candidates:
+        if within_threshold(candidate["price_per_hour"]):
+            return candidate
 
-    if best_result is None:
-        return None
+    # If no candidates within threshold, fall back to optimal
+    _LOGGER.warning(
+        "No intervals found within price tolerance (%.1f%%), using optimal interval",
+        price_tolerance_percent,
+    )
+    return optimal_result
+
+
+def _select_candidate_vectorized(
+    slot_start_times,
+    slot_end_times,
+    prices,
+    earliest_start: int,
+    latest_end: int,
+    duration: int,
+    most_expensive: bool,
+    price_tolerance_percent: float,
+):
+    """Same as _select_candidate() on the exact mode table, using NumPy.
 
-    # Apply price tolerance logic (reuse existing logic)
-    if price_tolerance_percent > 0.0:
-        # Find all intervals within tolerance of best_result
-        optimal_price_per_hour = best_result["price_per_hour"]
-
-        if most_expensive:
-            # For most expensive mode, threshold is lower bound
-            threshold = optimal_price_per_hour * (1 - price_tolerance_percent / 100)
-
-            def within_threshold(price):
-                return price >= threshold
-
-        else:
-            # For cheapest mode, threshold is upper bound
-            threshold = optimal_price_per_hour * (1 + price_tolerance_percent / 100)
-
-            def within_threshold(price):
-                return price <= threshold
-
-        # Find all intervals within threshold
-        candidates = []
-        for start in start_times:
-            for test_duration in test_durations:
-                if start + test_duration > latest_end:
-                    continue
-                price = _calc_interval_price(marketdata, start, test_duration)
-                if price is None:
-                    continue
-                price_per_hour_candidate = (
-                    price * SECONDS_PER_HOUR / test_duration.total_seconds()
-                )
-                if within_threshold(price_per_hour_candidate):
-                    candidates.append(
-                        {
-                            "start": start,
-                            "end": start + test_duration,
-                            "interval_price": price,
-                            "price_per_hour": price_per_hour_candidate,
-                        }
-                    )
+    The optimum is searched among the running records of the price per hour
+    only, because the sequential comparison never selects anything else.
+    """
+    start_times, interval_prices, prices_per_hour = vectorized.contiguous_candidates(
+        slot_start_times,
+        slot_end_times,
+        prices,
+        earliest_start,
+        latest_end,
+        duration,
+    )
 
-        # If no candidates within threshold, fall back to optimal
-        if len(candidates) == 0:
-            _LOGGER.warning(
-                "No intervals found within price tolerance (%.1f%%), "
-                "using optimal interval",
-                price_tolerance_percent,
-            )
-            return best_result
+    def candidate(i):
+        return {
+            "start": int(start_times[i]),
+            "end": int(start_times[i]) + duration,
+            "interval_price": float(interval_prices[i]),
+            "price_per_hour": float(prices_per_hour[i]),
+        }
+
+    optimal_result = _select_candidate(
+        [
+            candidate(i)
+            for i in vectorized.running_records(prices_per_hour, most_expensive)
+        ],
+        most_expensive,
+    )
+    if optimal_result is None or price_tolerance_percent == 0.0:
+        return optimal_result
 
-    else:
-        # No tolerance, use the best result
-        candidates = [best_result]
+    i = vectorized.first_index(
+        _within_tolerance(
+            optimal_result["price_per_hour"], most_expensive, price_tolerance_percent
+        )(prices_per_hour)
+    )
+    if i is not None:
+        return candidate(i)
 
-    # Prefer earliest start time
-    candidates.sort(key=lambda x: x["start"])
-    return candidates[0]
+    _LOGGER.warning(
+        "No intervals found within price tolerance (%.1f%%), using optimal interval",
+        price_tolerance_percent,
+    )
+    return optimal_result
 
 
-def calc_interval_for_contiguous(
+def _convert_input(
     marketdata,
     earliest_start: datetime,
     latest_end: datetime,
     duration: timedelta,
-    most_expensive: bool = True,
-    price_tolerance_percent: float = 0.0,
-    min_duration: timedelta | None = None,
+    min_duration: timedelta | None,
 ):
+    """Convert the input to epoch microseconds or return None if data is missing.
+
+    Returns slot start times, slot end times, prices, earliest start, latest
+    end, min duration and max duration.
+    """
     if len(marketdata) == 0:
         return None
 
-    if marketdata[-1].end_time < latest_end:
+    # convert once, everything below is integer arithmetic
+    slot_start_times, slot_end_times, prices = marketdata_to_epoch_us(marketdata)
+    earliest_start = to_epoch_us(earliest_start)
+    latest_end = to_epoch_us(latest_end)
+
+    if slot_end_times[-1] < latest_end:
         return None
 
     # Handle flexible duration
@@ -347,33 +626,149 @@ def calc_interval_for_contiguous(
     if min_duration > max_duration:
         raise ValueError("min_duration cannot be greater than max_duration")
 
+    return (
+        slot_start_times,
+        slot_end_times,
+        prices,
+        earliest_start,
+        latest_end,
+        min_duration // ONE_MICROSECOND,
+        max_duration // ONE_MICROSECOND,
+    )
+
+
+def _calc_candidate_table(marketdata, converted_input, most_expensive: bool):
+    """Build the start-sorted candidate table from _convert_input().
+
+    Times in the table are epoch microseconds, see _to_result().
+    """
+    (
+        slot_start_times,
+        slot_end_times,
+        prices,
+        earliest_start,
+        latest_end,
+        min_duration,
+        max_duration,
+    ) = converted_input
+
+    locator = create_slot_locator(marketdata, slot_start_times, slot_end_times)
+    price_index = _PriceIndex(slot_start_times, slot_end_times, prices, locator)
+
     if min_duration == max_duration:
         # Exact mode
-        start_times = _calc_start_times(
-            marketdata,
+        start_times = _iter_start_times(
+            slot_start_times,
+            slot_end_times,
             earliest_start=earliest_start,
             latest_end=latest_end,
-            duration=duration,
-        )
-        start_times = sorted(list(set(start_times)))
-        return _find_extreme_price_interval(
-            marketdata, start_times, duration, most_expensive, price_tolerance_percent
+            duration=max_duration,
+            locator=locator,
         )
+        return _calc_candidates(price_index, start_times, max_duration)
     else:
         # Flexible mode
-        start_times = _calc_flexible_start_times(
-            marketdata,
+        start_times = _iter_flexible_start_times(
+            slot_start_times,
+            slot_end_times,
             earliest_start=earliest_start,
             latest_end=latest_end,
             min_duration=min_duration,
             max_duration=max_duration,
+            locator=locator,
         )
-        return _find_flexible_extreme_price_interval(
-            marketdata,
+        return _calc_flexible_candidates(
+            price_index,
             start_times,
             min_duration,
             max_duration,
             latest_end,
             most_expensive,
+        )
+
+
+def _to_result(candidate, tzinfo):
+    """Convert a candidate from the table to a result with datetimes."""
+    return {
+        **candidate,
+        "start": from_epoch_us(candidate["start"], tzinfo),
+        "end": from_epoch_us(candidate["end"], tzinfo),
+    }
+
+
+def calc_candidate_intervals_for_contiguous(
+    marketdata,
+    earliest_start: datetime,
+    latest_end: datetime,
+    duration: timedelta,
+    most_expensive: bool = True,
+    min_duration: timedelta | None = None,
+):
+    """Calculate all candidate intervals, ranked from best to worst.
+
+    Each candidate is a dict with start, end, interval_price and
+    price_per_hour. In flexible mode, there is one candidate (the best
+    duration) per start time. Candidates with equal price per hour are
+    ranked by start time.
+    """
+    converted_input = _convert_input(
+        marketdata, earliest_start, latest_end, duration, min_duration
+    )
+    if converted_input is None:
+        return None
+
+    candidates = _calc_candidate_table(marketdata, converted_input, most_expensive)
+    return [
+        _to_result(candidate, earliest_start.tzinfo)
+        for candidate in sorted(
+            candidates,
+            key=lambda c: (
+                -c["price_per_hour"] if most_expensive else c["price_per_hour"]
+            ),
+        )
+    ]
+
+
+def calc_interval_for_contiguous(
+    marketdata,
+    earliest_start: datetime,
+    latest_end: datetime,
+    duration: timedelta,
+    most_expensive: bool = True,
+    price_tolerance_percent: float = 0.0,
+    min_duration: timedelta | None = None,
+):
+    converted_input = _convert_input(
+        marketdata, earliest_start, latest_end, duration, min_duration
+    )
+    if converted_input is None:
+        return None
+
+    (
+        slot_start_times,
+        slot_end_times,
+        prices,
+        earliest_start_us,
+        latest_end_us,
+        min_duration,
+        max_duration,
+    ) = converted_input
+
+    if min_duration == max_duration and vectorized.is_enabled(len(slot_start_times)):
+        result = _select_candidate_vectorized(
+            slot_start_times,
+            slot_end_times,
+            prices,
+            earliest_start_us,
+            latest_end_us,
+            max_duration,
+            most_expensive,
             price_tolerance_percent,
         )
+    else:
+        candidates = _calc_candidate_table(marketdata, converted_input, most_expensive)
+        result = _select_candidate(candidates, most_expensive, price_tolerance_percent)
+    if result is None:
+        return None
+
+    return _to_result(result, earliest_start.tzinfo)
@@ -0,0 +1,84 @@
+"""Memoization of interval calculation results."""
+
+from __future__ import annotations
+
+from collections import OrderedDict, namedtuple
+
+DEFAULT_CACHE_SIZE = 128
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class IntervalCache:
+    """Bounded LRU cache for the interval calculation functions.
+
+    The interval calculations are pure functions of the market data and the
+    schedule parameters. Results are cached by the fingerprint of the market
+    timeline and the parameters, so sensors with identical settings and
+    repeated updates with the same data share one calculation.
+
+    Cached results are shared and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._results: OrderedDict = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def calc(self, func, marketdata, **kwargs):
+        """Return func(marketdata, **kwargs), cached if possible.
+
+        Market data without a fingerprint (e.g. plain lists) is not cached.
+        """
+        key = self._key(func, marketdata, kwargs)
+        if key is None:
+            return func(marketdata, **kwargs)
+
+        try:
+            result = self._results[key]
+        except KeyError:
+            pass
+        else:
+            self._hits += 1
+            self._results.move_to_end(key)
+            return result
+
+        self._misses += 1
+        result = func(marketdata, **kwargs)
+        self._insert(key, result)
+        return result
+
+    def contains(self, func, marketdata, **kwargs) -> bool:
+        """Return True if the result of func(marketdata, **kwargs) is cached."""
+        key = self._key(func, marketdata, kwargs)
+        return key is not None and key in self._results
+
+    def store(self, result, func, marketdata, **kwargs) -> None:
+        """Store a result of func(marketdata, **kwargs) calculated elsewhere."""
+        key = self._key(func, marketdata, kwargs)
+        if key is not None:
+            self._insert(key, result)
+
+    def cache_info(self) -> CacheInfo:
+        """Report cache statistics."""
+        return CacheInfo(self._hits, self._misses, self._maxsize, len(self._results))
+
+    def cache_clear(self) -> None:
+        """Clear the cache and statistics."""
+        self._results.clear()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(func, marketdata, kwargs):
+        fingerprint = getattr(marketdata, "fingerprint", None)
+        if fingerprint is None:
+            return None
+        return (func, fingerprint, tuple(sorted(kwargs.items())))
+
+    def _insert(self, key, result) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
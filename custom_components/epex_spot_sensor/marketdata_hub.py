@@ -0,0 +1,107 @@
+"""Market data shared by all sensors using the same price sensor."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+import homeassistant.util.dt as dt_util
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DOMAIN
+from .interval_cache import IntervalCache
+from .util import (
+    MarketdataStore,
+    MarketTimeline,
+    calc_marketdata_fingerprint,
+    get_marketdata_from_sensor_attrs,
+)
+
+# keep outdated entries for 1 day (exact time doesn't matter)
+MARKETDATA_RETENTION = timedelta(days=1)
+
+
+class MarketdataSource:
+    """Parsed and merged market data of a single price sensor."""
+
+    def __init__(self, entity_id: str):
+        self._entity_id = entity_id
+        self._fingerprint = None
+        self._store = MarketdataStore()
+        self._marketdata = MarketTimeline()
+
+    @property
+    def entity_id(self):
+        return self._entity_id
+
+    @property
+    def fingerprint(self):
+        """Fingerprint of the last merged data, None if it was invalid."""
+        return self._fingerprint
+
+    def get_marketdata(self, attributes):
+        """Return the merged market data for the given sensor attributes.
+
+        The 'data' attribute is only parsed and merged if its fingerprint
+        differs from the one of the previous call, so all subscribed sensors
+        share the same immutable timeline.
+        """
+        fingerprint = calc_marketdata_fingerprint(attributes.get("data"))
+        if fingerprint is not None and fingerprint == self._fingerprint:
+            return self._marketdata
+
+        self._fingerprint = None
+        marketdata = get_marketdata_from_sensor_attrs(attributes)
+
+        # now merge it with the cached info and remove outdated entries
+        self._store.merge(sorted(marketdata, key=lambda e: e.start_time))
+        self._store.evict(dt_util.now() - MARKETDATA_RETENTION)
+        self._marketdata = self._store.timeline()
+        self._fingerprint = fingerprint
+
+        return self._marketdata
+
+
+class MarketdataHub:
+    """Registry of market data sources, stored in hass.data[DOMAIN]."""
+
+    def __init__(self):
+        self._sources: dict[str, MarketdataSource] = {}
+        self._subscribers: dict[str, int] = {}
+        self._interval_cache = IntervalCache()
+
+    @property
+    def interval_cache(self) -> IntervalCache:
+        """Interval calculation results shared by all sensors."""
+        return self._interval_cache
+
+    def get_source(self, entity_id: str) -> MarketdataSource:
+        """Return the market data source of the given price sensor."""
+        if (source := self._sources.get(entity_id)) is None:
+            source = self._sources[entity_id] = MarketdataSource(entity_id)
+        return source
+
+    @callback
+    def async_subscribe(self, entity_id: str) -> CALLBACK_TYPE:
+        """Register a sensor using the given price sensor.
+
+        The source is dropped after the last subscriber has unsubscribed.
+        """
+        self.get_source(entity_id)
+        self._subscribers[entity_id] = self._subscribers.get(entity_id, 0) + 1
+
+        @callback
+        def async_unsubscribe() -> None:
+            self._subscribers[entity_id] -= 1
+            if self._subscribers[entity_id] == 0:
+                del self._subscribers[entity_id]
+                self._sources.pop(entity_id, None)
+
+        return async_unsubscribe
+
+
+@callback
+def async_get_marketdata_hub(hass: HomeAssistant) -> MarketdataHub:
+    """Return the market data hub, create it if necessary."""
+    if (hub := hass.data.get(DOMAIN)) is None:
+        hub = hass.data[DOMAIN] = MarketdataHub()
+    return hub
@@ -1,3 +1,6 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
 import logging
 
 from homeassistant.helpers import (
@@ -6,28 +9,37 @@ from homeassistant.helpers import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# supported price fields (in order of preference) and their unit
+PRICE_FIELDS = (
+    ("price_eur_per_mwh", "EUR/MWh"),
+    ("price_gbp_per_mwh", "GBP/MWh"),
+    ("price_ct_per_kwh", "ct/kWh"),
+    ("price_pence_per_kwh", "pence/kWh"),
+    ("price_per_kwh", "€/£/kWh"),
+)
+
+
+# the interval engines calculate with integer microseconds since the epoch,
+# naive datetimes are treated as UTC
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NAIVE_EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+MICROSECONDS_PER_SECOND = 1_000_000
+
+
+def _get_price(entry):
+    for field, uom in PRICE_FIELDS:
+        if (x := entry.get(field)) is not None:
+            return x, uom
+
+    raise KeyError("No valid price field found.")
+
 
 class Marketprice:
     def __init__(self, entry):
         self._start_time = cv.datetime(entry["start_time"])
         self._end_time = cv.datetime(entry["end_time"])
-        if (x := entry.get("price_eur_per_mwh")) is not None:
-            self._price = x
-            self._price_uom = "EUR/MWh"
-        elif (x := entry.get("price_gbp_per_mwh")) is not None:
-            self._price = x
-            self._price_uom = "GBP/MWh"
-        elif (x := entry.get("price_ct_per_kwh")) is not None:
-            self._price = x
-            self._price_uom = "ct/kWh"
-        elif (x := entry.get("price_pence_per_kwh")) is not None:
-            self._price = x
-            self._price_uom = "pence/kWh"
-        elif (x := entry.get("price_per_kwh")) is not None:
-            self._price = x
-            self._price_uom = "€/£/kWh"
-        else:
-            raise KeyError("No valid price field found.")
+        self._price, self._price_uom = _get_price(entry)
 
     def __repr__(self):
         return f"{self.__class__.__name__}(start: {self._start_time.isoformat()}, end: {self._end_time.isoformat()}, marketprice: {self._price} {self._price_uom})"  # noqa: E501
@@ -49,6 +61,336 @@ class Marketprice:
         return self._price_uom
 
 
+class MarketpriceView:
+    """Read-only, Marketprice compatible view of a MarketTimeline entry."""
+
+    __slots__ = ("_timeline", "_index")
+
+    def __init__(self, timeline, index: int):
+        self._timeline = timeline
+        self._index = index
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(start: {self.start_time.isoformat()}, end: {self.end_time.isoformat()}, marketprice: {self.price} {self.price_uom})"  # noqa: E501
+
+    @property
+    def start_time(self):
+        return self._timeline._datetimes()[0][self._index]
+
+    @property
+    def end_time(self):
+        return self._timeline._datetimes()[1][self._index]
+
+    @property
+    def price(self):
+        return self._timeline.prices[self._index]
+
+    @property
+    def price_uom(self):
+        return self._timeline._price_uoms[self._index]
+
+
+class MarketTimeline:
+    """Compact, immutable and time-sorted sequence of market prices.
+
+    Start and end times are stored as epoch seconds (int64) and prices as
+    float64 in arrays, so the interval engines can work on raw numbers.
+    Indexing and iterating yields MarketpriceView objects for compatibility
+    with Marketprice lists.
+    """
+
+    __slots__ = (
+        "_start_timestamps",
+        "_end_timestamps",
+        "_prices",
+        "_price_uoms",
+        "_tzinfo",
+        "_datetime_cache",
+        "_fingerprint",
+        "_step",
+    )
+
+    def __init__(self, marketdata=()):
+        """Create timeline from a time-sorted sequence of market prices."""
+        self._start_timestamps = array("q")
+        self._end_timestamps = array("q")
+        self._prices = array("d")
+        price_uoms = []
+        self._tzinfo = None
+        self._datetime_cache = None
+        self._fingerprint = None
+
+        for mp in marketdata:
+            if self._tzinfo is None:
+                self._tzinfo = mp.start_time.tzinfo
+            self._start_timestamps.append(int(mp.start_time.timestamp()))
+            self._end_timestamps.append(int(mp.end_time.timestamp()))
+            self._prices.append(mp.price)
+            price_uoms.append(mp.price_uom)
+
+        self._price_uoms = tuple(price_uoms)
+        self._step = calc_grid_step(self._start_timestamps, self._end_timestamps)
+
+    @classmethod
+    def _from_arrays(cls, start_timestamps, end_timestamps, prices, price_uoms, tzinfo):
+        timeline = cls.__new__(cls)
+        timeline._start_timestamps = start_timestamps
+        timeline._end_timestamps = end_timestamps
+        timeline._prices = prices
+        timeline._price_uoms = tuple(price_uoms)
+        timeline._tzinfo = tzinfo
+        timeline._datetime_cache = None
+        timeline._fingerprint = None
+        timeline._step = calc_grid_step(start_timestamps, end_timestamps)
+        return timeline
+
+    def __len__(self):
+        return len(self._prices)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self._prices)
+        if not 0 <= index < len(self._prices):
+            raise IndexError("timeline index out of range")
+        return MarketpriceView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self._prices)):
+            yield MarketpriceView(self, index)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self)} entries)"
+
+    @property
+    def start_timestamps(self):
+        """Start times as epoch seconds."""
+        return self._start_timestamps
+
+    @property
+    def end_timestamps(self):
+        """End times as epoch seconds."""
+        return self._end_timestamps
+
+    @property
+    def prices(self):
+        return self._prices
+
+    @property
+    def tzinfo(self):
+        return self._tzinfo
+
+    @property
+    def step(self):
+        """Slot length in seconds if the slots form a uniform grid, else None."""
+        return self._step
+
+    @property
+    def fingerprint(self):
+        """Hashable fingerprint of the timeline content."""
+        if self._fingerprint is None:
+            self._fingerprint = (
+                len(self._prices),
+                hash(self._start_timestamps.tobytes()),
+                hash(self._end_timestamps.tobytes()),
+                hash(self._prices.tobytes()),
+            )
+        return self._fingerprint
+
+    def to_datetime(self, timestamp: float) -> datetime:
+        """Convert epoch seconds to a datetime in the timezone of the data."""
+        return datetime.fromtimestamp(timestamp, self._tzinfo)
+
+    def _datetimes(self):
+        # datetime objects are only created for Marketprice compatible access
+        if self._datetime_cache is None:
+            self._datetime_cache = (
+                tuple(self.to_datetime(t) for t in self._start_timestamps),
+                tuple(self.to_datetime(t) for t in self._end_timestamps),
+            )
+        return self._datetime_cache
+
+
+class MarketdataStore:
+    """Append-only, time-ordered store of market prices.
+
+    New entries are appended at the tail, entries with a known start time
+    overwrite the stored ones in place and outdated entries are evicted from
+    the head. Merging costs time proportional to the merged entries, not to
+    the size of the store.
+    """
+
+    def __init__(self):
+        self._start_timestamps = array("q")
+        self._end_timestamps = array("q")
+        self._prices = array("d")
+        self._price_uoms = []
+        self._tzinfo = None
+        # index of the first valid entry, evicted entries are removed lazily
+        self._head = 0
+
+    def __len__(self):
+        return len(self._prices) - self._head
+
+    def merge(self, marketdata):
+        """Merge time-sorted market prices into the store.
+
+        Entries older than the tail which don't match a stored start time are
+        ignored.
+        """
+        for mp in marketdata:
+            start_timestamp = int(mp.start_time.timestamp())
+
+            if len(self) == 0 or start_timestamp > self._start_timestamps[-1]:
+                if self._tzinfo is None:
+                    self._tzinfo = mp.start_time.tzinfo
+                self._start_timestamps.append(start_timestamp)
+                self._end_timestamps.append(int(mp.end_time.timestamp()))
+                self._prices.append(mp.price)
+                self._price_uoms.append(mp.price_uom)
+                continue
+
+            i = bisect_left(self._start_timestamps, start_timestamp, self._head)
+            if i < len(self._prices) and self._start_timestamps[i] == start_timestamp:
+                self._end_timestamps[i] = int(mp.end_time.timestamp())
+                self._prices[i] = mp.price
+                self._price_uoms[i] = mp.price_uom
+
+    def evict(self, start_time: datetime):
+        """Evict all entries starting before start_time."""
+        start_timestamp = start_time.timestamp()
+        while self._head < len(self._prices) and (
+            self._start_timestamps[self._head] < start_timestamp
+        ):
+            self._head += 1
+
+        # compact once half of the arrays are evicted entries
+        if self._head > len(self._prices) // 2:
+            del self._start_timestamps[: self._head]
+            del self._end_timestamps[: self._head]
+            del self._prices[: self._head]
+            del self._price_uoms[: self._head]
+            self._head = 0
+
+    def timeline(self) -> MarketTimeline:
+        """Return an immutable snapshot of the store."""
+        return MarketTimeline._from_arrays(
+            self._start_timestamps[self._head :],
+            self._end_timestamps[self._head :],
+            self._prices[self._head :],
+            self._price_uoms[self._head :],
+            self._tzinfo,
+        )
+
+
+def calc_grid_step(start_times, end_times):
+    """Return the slot length if all slots are gap-free and of equal length.
+
+    Returns None for irregular data (e.g. gaps or mixed slot lengths).
+    """
+    if len(start_times) == 0:
+        return None
+
+    first = start_times[0]
+    step = end_times[0] - first
+    if step <= 0:
+        return None
+
+    for i, start_time in enumerate(start_times):
+        if start_time != first + i * step or end_times[i] != start_time + step:
+            return None
+
+    return step
+
+
+class SlotLocator:
+    """Locate time-sorted slots by time.
+
+    The methods return the same as bisect on the slot start or end times, but
+    use index arithmetic if the slots form a uniform grid.
+    """
+
+    def __init__(self, start_times, end_times, step=None):
+        self._start_times = start_times
+        self._end_times = end_times
+        self._step = step
+        self._count = len(start_times)
+
+    def start_left(self, t) -> int:
+        """Return bisect_left(start_times, t)."""
+        if self._step is None:
+            return bisect_left(self._start_times, t)
+        return min(max(-((self._start_times[0] - t) // self._step), 0), self._count)
+
+    def start_right(self, t) -> int:
+        """Return bisect_right(start_times, t)."""
+        if self._step is None:
+            return bisect_right(self._start_times, t)
+        return min(max((t - self._start_times[0]) // self._step + 1, 0), self._count)
+
+    def end_left(self, t) -> int:
+        """Return bisect_left(end_times, t)."""
+        if self._step is None:
+            return bisect_left(self._end_times, t)
+        return self.start_left(t - self._step)
+
+    def end_right(self, t) -> int:
+        """Return bisect_right(end_times, t)."""
+        if self._step is None:
+            return bisect_right(self._end_times, t)
+        return self.start_right(t - self._step)
+
+
+def to_epoch_us(dt: datetime) -> int:
+    """Convert datetime to microseconds since the epoch."""
+    return (dt - (NAIVE_EPOCH if dt.tzinfo is None else EPOCH)) // ONE_MICROSECOND
+
+
+def from_epoch_us(timestamp: int, tzinfo) -> datetime:
+    """Convert microseconds since the epoch to a datetime in the given timezone.
+
+    Returns a naive datetime if tzinfo is None.
+    """
+    if tzinfo is None:
+        return NAIVE_EPOCH + timedelta(microseconds=timestamp)
+    return (EPOCH + timedelta(microseconds=timestamp)).astimezone(tzinfo)
+
+
+def marketdata_to_epoch_us(marketdata):
+    """Return start times, end times (epoch microseconds) and prices as lists.
+
+    The raw arrays of a MarketTimeline are used directly, other market data
+    is converted entry by entry.
+    """
+    if isinstance(marketdata, MarketTimeline) and marketdata.tzinfo is not None:
+        return (
+            [t * MICROSECONDS_PER_SECOND for t in marketdata.start_timestamps],
+            [t * MICROSECONDS_PER_SECOND for t in marketdata.end_timestamps],
+            marketdata.prices,
+        )
+
+    return (
+        [to_epoch_us(mp.start_time) for mp in marketdata],
+        [to_epoch_us(mp.end_time) for mp in marketdata],
+        [mp.price for mp in marketdata],
+    )
+
+
+def create_slot_locator(marketdata, start_times, end_times) -> SlotLocator:
+    """Create a SlotLocator for converted market data.
+
+    The grid detected by a MarketTimeline is reused, other market data is
+    checked for a uniform grid.
+    """
+    if isinstance(marketdata, MarketTimeline) and marketdata.tzinfo is not None:
+        step = marketdata.step
+        if step is not None:
+            step *= MICROSECONDS_PER_SECOND
+    else:
+        step = calc_grid_step(start_times, end_times)
+
+    return SlotLocator(start_times, end_times, step)
+
+
 def get_marketdata_from_sensor_attrs(attributes):
     """Convert sensor attributes to market price list."""
     try:
@@ -57,3 +399,29 @@ def get_marketdata_from_sensor_attrs(attributes):
         raise KeyError("'data' missing in sensor attributes")
 
     return [Marketprice(e) for e in data]
+
+
+def calc_marketdata_fingerprint(data):
+    """Calculate a cheap fingerprint of the 'data' sensor attribute.
+
+    The fingerprint consists of the number of entries, the first start time,
+    the last end time and a hash of all prices. Returns None if the data is
+    invalid.
+    """
+    if not isinstance(data, (list, tuple)):
+        return None
+
+    if len(data) == 0:
+        return (0,)
+
+    try:
+        return (
+            len(data),
+            data[0]["start_time"],
+            data[-1]["end_time"],
+            hash(
+                tuple(entry.get(field) for entry in data for field, _ in PRICE_FIELDS)
+            ),
+        )
+    except (AttributeError, KeyError, TypeError):
+        return None
@@ -0,0 +1,342 @@
+"""Optional NumPy primitives for the interval engines.
+
+NumPy is not a requirement of this integration. If it is importable, the
+engines hand large inputs to these functions instead of their pure-Python
+loops. The floating point operations are evaluated in the same order as in
+the pure-Python code, so both produce identical results.
+
+All times and durations are integer microseconds since the epoch.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the installation
+    np = None
+
+from .util import MICROSECONDS_PER_SECOND
+
+SECONDS_PER_HOUR = 60 * 60
+
+# below this number of slots, building the arrays costs more than it saves
+MIN_SLOTS = 256
+
+# below this number of states per cell, the run constraint program is faster
+# in pure Python
+MIN_STATES = 64
+
+
+def is_enabled(slot_count: int) -> bool:
+    """Return True if NumPy is available and worth using for slot_count."""
+    return np is not None and slot_count >= MIN_SLOTS
+
+
+def is_enabled_for_states(state_count: int) -> bool:
+    """Return True if NumPy is available and worth using for state_count."""
+    return np is not None and state_count >= MIN_STATES
+
+
+def contiguous_candidates(
+    slot_start_times,
+    slot_end_times,
+    prices,
+    earliest_start: int,
+    latest_end: int,
+    duration: int,
+):
+    """Price all meaningful start times for a fixed duration.
+
+    Same as _calc_candidates() on _iter_start_times() in contiguous_interval,
+    as arrays (start times, interval prices, prices per hour) sorted by start
+    time. Start times whose window isn't covered by market data are dropped.
+    """
+    slot_start_times = np.asarray(slot_start_times, dtype=np.int64)
+    slot_end_times = np.asarray(slot_end_times, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # meaningful start times: window limits, slot starts and slot ends
+    # shifted back by duration
+    latest_start = latest_end - duration
+    if latest_start < earliest_start:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+
+    first_start = np.searchsorted(slot_start_times, earliest_start, "left")
+    last_start = np.searchsorted(slot_start_times, latest_start, "right")
+    first_end = np.searchsorted(slot_end_times, earliest_start + duration, "left")
+    last_end = np.searchsorted(slot_end_times, latest_end, "right")
+    start_times = np.unique(
+        np.concatenate(
+            (
+                np.array([earliest_start, latest_start], dtype=np.int64),
+                slot_start_times[first_start:last_start],
+                slot_end_times[first_end:last_end] - duration,
+            )
+        )
+    )
+    stop_times = start_times + duration
+
+    # cumulative costs and holes before each slot, like _PriceIndex
+    costs = np.zeros(len(prices) + 1)
+    np.cumsum(
+        prices
+        * ((slot_end_times - slot_start_times) / MICROSECONDS_PER_SECOND)
+        / SECONDS_PER_HOUR,
+        out=costs[1:],
+    )
+    gaps = np.zeros(len(prices), dtype=np.int64)
+    np.cumsum(slot_start_times[1:] != slot_end_times[:-1], out=gaps[1:])
+
+    # slots containing the first and the last moment of each window
+    count = len(slot_start_times)
+    first = np.searchsorted(slot_end_times, start_times, "right")
+    last = np.searchsorted(slot_end_times, stop_times, "left")
+    covered = (first < count) & (last < count)
+    first = np.minimum(first, count - 1)
+    last = np.minimum(last, count - 1)
+    covered &= (
+        (slot_start_times[first] <= start_times)
+        & (start_times < slot_end_times[first])
+        & (slot_start_times[last] < stop_times)
+        & (gaps[first] == gaps[last])
+    )
+
+    start_times = start_times[covered]
+    stop_times = stop_times[covered]
+    first = first[covered]
+    last = last[covered]
+
+    interval_prices = np.where(
+        first == last,
+        prices[first]
+        * ((stop_times - start_times) / MICROSECONDS_PER_SECOND)
+        / SECONDS_PER_HOUR,
+        prices[first]
+        * ((slot_end_times[first] - start_times) / MICROSECONDS_PER_SECOND)
+        / SECONDS_PER_HOUR
+        + costs[last]
+        - costs[first + 1]
+        + prices[last]
+        * ((stop_times - slot_start_times[last]) / MICROSECONDS_PER_SECOND)
+        / SECONDS_PER_HOUR,
+    )
+    prices_per_hour = (
+        interval_prices * SECONDS_PER_HOUR / (duration / MICROSECONDS_PER_SECOND)
+    )
+
+    return start_times, interval_prices, prices_per_hour
+
+
+def running_records(values, most_expensive: bool):
+    """Return the indices of strict running minima (or maxima).
+
+    A sequential "keep the best so far" scan can only switch to one of these,
+    so replaying the scan on them gives the same result as on all values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return []
+
+    if most_expensive:
+        best = np.maximum.accumulate(values)
+        records = values[1:] > best[:-1]
+    else:
+        best = np.minimum.accumulate(values)
+        records = values[1:] < best[:-1]
+
+    return [0] + (np.flatnonzero(records) + 1).tolist()
+
+
+def first_index(mask):
+    """Return the index of the first set entry of mask or None."""
+    if not mask.any():
+        return None
+    return int(np.argmax(mask))
+
+
+def order_by_price(prices, slots, most_expensive: bool, latest_first: bool = False):
+    """Return all slots in the order of _iter_by_price() in intermittent_interval.
+
+    The slots must be in ascending order.
+    """
+    slots, keys = _price_keys(prices, slots, most_expensive, latest_first)
+    return slots[np.argsort(keys, kind="stable")].tolist()
+
+
+def select_by_price(
+    slot_start_times,
+    slot_end_times,
+    prices,
+    slots,
+    earliest_start: int,
+    latest_end: int,
+    duration: int,
+    most_expensive: bool,
+):
+    """Return the leading slots of order_by_price() which cover duration.
+
+    The k best slots are separated by a partition instead of sorting all of
+    them; all slots are returned if they don't cover duration together.
+    """
+    slots, keys = _price_keys(prices, slots, most_expensive, False)
+    count = len(slots)
+
+    # active time of each slot within the window
+    lengths = np.minimum(
+        np.asarray(slot_end_times, dtype=np.int64)[slots], latest_end
+    ) - np.maximum(np.asarray(slot_start_times, dtype=np.int64)[slots], earliest_start)
+
+    # inner slots aren't cut by the window, so k of them cover duration; the
+    # two slots at the window limits are added on top
+    if count > 2:
+        k = min(count, -(-duration // max(int(lengths[1:-1].min()), 1)) + 2)
+        # include all slots equal to the k-th, so ties keep their slot order
+        kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+        selection = np.flatnonzero(keys <= kth)
+        selection = selection[np.argsort(keys[selection], kind="stable")]
+        if lengths[selection].sum() >= duration:
+            return slots[selection].tolist()
+
+    return slots[np.argsort(keys, kind="stable")].tolist()
+
+
+def _price_keys(prices, slots, most_expensive: bool, latest_first: bool):
+    """Return slots and sort keys such that a stable sort orders them by price."""
+    if isinstance(slots, range):
+        slots = np.arange(slots.start, slots.stop, slots.step, dtype=np.int64)
+    else:
+        slots = np.asarray(slots, dtype=np.int64)
+    if latest_first:
+        slots = slots[::-1]
+
+    keys = np.asarray(prices, dtype=np.float64)[slots]
+    if most_expensive:
+        keys = -keys
+
+    return slots, keys
+
+
+def run_constraint_pass(
+    costs,
+    partial_costs,
+    acc_costs,
+    gaps,
+    needed: int,
+    max_runs: int,
+    counted: bool,
+    layers: int,
+    run_length: int,
+    partial_run_length: int,
+):
+    """Same as _run_constraint_pass() in intermittent_interval, on arrays.
+
+    The tables of a cell are (layers, max_runs + 1, needed + 1) arrays, so
+    every transition is a single array operation.
+    """
+    count = len(costs)
+    shape = (layers, max_runs + 1, needed + 1)
+    # run counts a new run can follow
+    runs = max_runs + 1 - counted
+
+    def after_gap(t):
+        return t > 0 and gaps[t] != gaps[t - 1]
+
+    def before(t, both):
+        """Return the best prices after t cells, cell t-1 off (or any)."""
+        if both:
+            return np.minimum(off[t], on[t])
+        return off[t]
+
+    lookback = max(run_length, partial_run_length + 1)
+
+    off = [np.full(shape, np.inf)]
+    off[0][0, 0, 0] = 0.0
+    on = [np.full(shape, np.inf)]
+    better = []
+    lowered = [None]
+
+    for t in range(1, count + 1):
+        c = t - 1
+        prev_off = off[c]
+        prev_on = on[c]
+        joined = c > 0 and gaps[c] == gaps[c - 1]
+        lo = max(needed - (count - t), 0)
+        hi = min(t, needed) + 1
+
+        better.append(prev_on < prev_off)
+        new_off = np.full(shape, np.inf)
+        new_off[..., lo:hi] = np.minimum(prev_off[..., lo:hi], prev_on[..., lo:hi])
+        new_on = np.full(shape, np.inf)
+        if joined:
+            first = max(lo, 1)
+            new_on[..., first:hi] = prev_on[..., first - 1 : hi - 1] + costs[c]
+
+        started = None
+        start = t - run_length
+        if start >= 0 and gaps[start] == gaps[c]:
+            started = np.zeros(shape, dtype=bool)
+            started[:, counted:] = _relax(
+                new_on[:, counted:],
+                run_length,
+                before(start, after_gap(start))[:, :runs],
+                acc_costs[t] - acc_costs[start],
+                lo,
+                hi,
+            )
+
+        remainder_after = remainder_before = remainder_end = None
+        if layers == 2:
+            if joined:
+                remainder_after = _relax(
+                    new_off[1], 0, prev_on[0], partial_costs[c], lo, hi
+                )
+
+            start = t - partial_run_length
+            if start > 0 and gaps[start - 1] == gaps[c]:
+                remainder_before = np.zeros(shape[1:], dtype=bool)
+                remainder_before[counted:] = _relax(
+                    new_on[1, counted:],
+                    partial_run_length,
+                    before(start - 1, True)[0, :runs],
+                    partial_costs[start - 1] + (acc_costs[t] - acc_costs[start]),
+                    lo,
+                    hi,
+                )
+
+            start = c - partial_run_length
+            if (
+                0 < partial_run_length < run_length
+                and start >= 0
+                and gaps[start] == gaps[c]
+            ):
+                remainder_end = np.zeros(shape[1:], dtype=bool)
+                remainder_end[counted:] = _relax(
+                    new_off[1, counted:],
+                    partial_run_length,
+                    before(start, after_gap(start))[0, :runs],
+                    acc_costs[c] - acc_costs[start] + partial_costs[c],
+                    lo,
+                    hi,
+                )
+
+        off.append(new_off)
+        on.append(new_on)
+        lowered.append((started, remainder_after, remainder_before, remainder_end))
+        if t >= lookback:
+            off[t - lookback] = on[t - lookback] = None
+
+    return off[count], on[count], better, lowered
+
+
+def _relax(values, offset, sources, cost, lo, hi):
+    """Lower values[..., j] to sources[..., j - offset] + cost for lo <= j < hi.
+
+    The values are lowered in place, returns the lowered positions.
+    """
+    lowered = np.zeros(values.shape, dtype=bool)
+    first = max(offset, lo)
+    if first < hi:
+        candidates = sources[..., first - offset : hi - offset] + cost
+        current = values[..., first:hi]
+        lowered[..., first:hi] = candidates < current
+        np.minimum(current, candidates, out=current)
+    return lowered
@@ -3,12 +3,26 @@ from unittest.mock import patch
 import pytest
 from homeassistant.util import dt as dt_util
 from homeassistant.const import CONF_ENTITY_ID
+from custom_components.epex_spot_sensor.binary_sensor import (
+    BinarySensor,
+    FullHistoryBinarySensor,
+    _calc_all,
+)
+from custom_components.epex_spot_sensor.contiguous_interval import (
+    calc_interval_for_contiguous,
+)
 from custom_components.epex_spot_sensor.const import (
+    ATTR_DATA,
+    ATTR_PLAN,
     CONF_EARLIEST_START_TIME,
     CONF_LATEST_END_TIME,
     CONF_DURATION,
+    CONF_DURATION_MODE,
     CONF_INTERVAL_MODE,
+    CONF_MAX_SEGMENTS,
+    CONF_MIN_DURATION,
     CONF_PRICE_MODE,
+    DurationModes,
     IntervalModes,
     PriceModes,
 )
@@ -51,7 +65,7 @@ async def test_binary_sensor_setup(hass):
     config_entry.add_to_hass(hass)
 
     with patch(
-        "custom_components.epex_spot_sensor.binary_sensor.get_marketdata_from_sensor_attrs",
+        "custom_components.epex_spot_sensor.marketdata_hub.get_marketdata_from_sensor_attrs",
         return_value=[],
     ):
         await hass.config_entries.async_setup(config_entry.entry_id)
@@ -205,3 +219,618 @@ async def test_binary_sensor_crossing_midnight(hass, freezer):
 
     state = hass.states.get("binary_sensor.test_sensor_midnight")
     assert state.state == "off"
+
+
+async def test_binary_sensor_switches_at_exact_boundary(hass, freezer):
+    """Test sensor switches on at a boundary which is not minute-aligned."""
+    now = dt_util.now().replace(hour=10, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    # 11:00-12:00 is cheapest, but the interval has to end at 11:40:20
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        price = 5.0 if i == 11 else 10.0
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": price,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "10.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor Boundary",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "11:40:20",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("binary_sensor.test_sensor_boundary")
+    assert state.state == "off"
+
+    future = now.replace(minute=40, second=20)
+    freezer.move_to(future)
+    async_fire_time_changed(hass, future)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("binary_sensor.test_sensor_boundary")
+    assert state.state == "on"
+
+    future = now.replace(hour=11, minute=40, second=20)
+    freezer.move_to(future)
+    async_fire_time_changed(hass, future)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("binary_sensor.test_sensor_boundary")
+    assert state.state == "off"
+
+
+async def test_binary_sensor_skips_unchanged_data(hass, freezer):
+    """Test that a price state change with unchanged data skips the search."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        price = 5.0 if i == 12 else 10.0
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": price,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    with patch(
+        "custom_components.epex_spot_sensor.binary_sensor.calc_interval_for_contiguous",
+        wraps=calc_interval_for_contiguous,
+    ) as mock_calc:
+        # new state, but a copy of the same data
+        hass.states.async_set("sensor.epex_spot_price", "6.0", {"data": [*market_data]})
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_calc.call_count == 0
+        assert hass.states.get("binary_sensor.test_sensor").state == "on"
+
+        # changed data (next day published)
+        start = now.replace(hour=0) + timedelta(days=1)
+        market_data = [
+            *market_data,
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 1.0,
+            },
+        ]
+        hass.states.async_set("sensor.epex_spot_price", "6.0", {"data": market_data})
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_calc.call_count > 0
+        assert hass.states.get("binary_sensor.test_sensor").state == "on"
+
+
+async def test_binary_sensor_flexible_duration(hass, freezer):
+    """Test that the configured minimum duration is used in flexible mode."""
+    now = dt_util.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": [10.0, 20.0, 30.0, 40.0][i] if i < 4 else 50.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "10.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "04:00:00",
+            CONF_DURATION: {"hours": 3},
+            CONF_DURATION_MODE: DurationModes.FLEXIBLE.value,
+            CONF_MIN_DURATION: {"hours": 1, "minutes": 30},
+            CONF_INTERVAL_MODE: IntervalModes.INTERMITTENT.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # the average price only gets worse beyond the minimum duration
+    state = hass.states.get("binary_sensor.test_sensor")
+    assert [(e["start_time"], e["end_time"]) for e in state.attributes[ATTR_DATA]] == [
+        (now.isoformat(), (now + timedelta(minutes=90)).isoformat())
+    ]
+
+
+async def test_binary_sensor_keeps_windows_apart(hass, freezer):
+    """Test that adjacent intervals of consecutive windows are not merged."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(48):
+        start = now + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i in (23, 24) else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "10.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "12:00:00",
+            CONF_LATEST_END_TIME: "12:00:00",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.INTERMITTENT.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # the cheapest slot of each window ends or starts at the window boundary
+    state = hass.states.get("binary_sensor.test_sensor")
+    boundary = now + timedelta(days=1)
+    assert [(e["start_time"], e["end_time"]) for e in state.attributes[ATTR_DATA]] == [
+        ((boundary - timedelta(hours=1)).isoformat(), boundary.isoformat()),
+        (boundary.isoformat(), (boundary + timedelta(hours=1)).isoformat()),
+    ]
+
+
+async def test_binary_sensor_skips_unchanged_state_write(hass, freezer):
+    """Test that an update with unchanged state and plan isn't written."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i == 12 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    with patch.object(BinarySensor, "async_write_ha_state") as mock_write:
+        # the price sensor ticks, but neither state nor plan change
+        hass.states.async_set("sensor.epex_spot_price", "6.0", {"data": market_data})
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_write.call_count == 0
+
+        # the interval ends
+        freezer.move_to(now + timedelta(hours=1))
+        async_fire_time_changed(hass, now + timedelta(hours=1))
+        await hass.async_block_till_done()
+
+        assert mock_write.call_count == 1
+
+
+async def test_binary_sensor_publishes_compact_plan(hass, freezer):
+    """Test the compact plan attribute and the unrecorded attributes."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i == 12 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("binary_sensor.test_sensor")
+    assert state.attributes[ATTR_PLAN] == [
+        [int(now.timestamp()), int(now.timestamp()) + 3600]
+    ]
+
+    assert ATTR_DATA in BinarySensor._unrecorded_attributes
+    assert ATTR_PLAN not in BinarySensor._unrecorded_attributes
+    assert not FullHistoryBinarySensor._unrecorded_attributes
+
+
+async def test_binary_sensor_coalesces_state_changes(hass, freezer):
+    """Test that a burst of price sensor changes triggers a single update."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": []})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    def market_data(price):
+        return [
+            {
+                "start_time": now.isoformat(),
+                "end_time": (now + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": price,
+            }
+        ]
+
+    with patch.object(BinarySensor, "_update_state") as mock_update:
+        for price in range(5):
+            hass.states.async_set(
+                "sensor.epex_spot_price", str(price), {"data": market_data(price)}
+            )
+        await hass.async_block_till_done()
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_update.call_count == 1
+
+
+async def test_binary_sensor_reuses_plan_for_unchanged_data(hass, freezer):
+    """Test that a price sensor tick with unchanged data skips the calculation."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i == 12 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert hass.states.get("binary_sensor.test_sensor").state == "on"
+
+    with patch.object(BinarySensor, "_update_state") as mock_update:
+        hass.states.async_set(
+            "sensor.epex_spot_price", "6.0", {"data": list(market_data)}
+        )
+        await hass.async_block_till_done()
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_update.call_count == 0
+
+        market_data[12] = {**market_data[12], "price_per_kwh": 20.0}
+        hass.states.async_set("sensor.epex_spot_price", "20.0", {"data": market_data})
+        await hass.async_block_till_done()
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+        assert mock_update.call_count == 1
+
+
+async def test_binary_sensor_calculates_large_data_in_executor(hass, freezer):
+    """Test that the result of an executor calculation is applied."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i == 12 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.epex_spot_sensor.binary_sensor.EXECUTOR_MIN_TIME", 0
+    ), patch(
+        "custom_components.epex_spot_sensor.binary_sensor._calc_all",
+        wraps=_calc_all,
+    ) as mock_calc_all:
+        await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+        await hass.async_block_till_done()
+
+        assert mock_calc_all.call_count == 1
+        state = hass.states.get("binary_sensor.test_sensor")
+        assert state.state == "on"
+        assert state.attributes[ATTR_PLAN] == [
+            [int(now.timestamp()), int(now.timestamp()) + 3600]
+        ]
+
+
+async def test_binary_sensor_calculates_small_run_constraints_inline(hass, freezer):
+    """Test that run constraints over few slots are calculated inline."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i in (11, 12) else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 2},
+            CONF_INTERVAL_MODE: IntervalModes.INTERMITTENT.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+            CONF_MAX_SEGMENTS: 1,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.epex_spot_sensor.binary_sensor._calc_all",
+        wraps=_calc_all,
+    ) as mock_calc_all:
+        await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+        assert mock_calc_all.call_count == 0
+        state = hass.states.get("binary_sensor.test_sensor")
+        assert state.state == "on"
+        assert state.attributes[ATTR_PLAN] == [
+            [int(now.timestamp()) - 3600, int(now.timestamp()) + 3600]
+        ]
+
+
+async def test_binary_sensor_calculates_run_constraints_in_executor(hass, freezer):
+    """Test that run constraints over quarter-hour slots use the executor."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(96):
+        start = now.replace(hour=0) + timedelta(minutes=15 * i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=15)).isoformat(),
+                "price_per_kwh": 5.0 if 44 <= i < 68 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 6},
+            CONF_INTERVAL_MODE: IntervalModes.INTERMITTENT.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+            CONF_MAX_SEGMENTS: 3,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.epex_spot_sensor.binary_sensor._calc_all",
+        wraps=_calc_all,
+    ) as mock_calc_all:
+        await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+        await hass.async_block_till_done()
+
+        assert mock_calc_all.call_count == 1
+        state = hass.states.get("binary_sensor.test_sensor")
+        assert state.state == "on"
+        assert state.attributes[ATTR_PLAN] == [
+            [int(now.timestamp()) - 3600, int(now.timestamp()) + 5 * 3600]
+        ]
+
+
+async def test_binary_sensor_switches_from_day_plan(hass, freezer):
+    """Test that a switch time within the window doesn't rebuild the plan."""
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    freezer.move_to(now)
+
+    market_data = []
+    for i in range(24):
+        start = now.replace(hour=0) + timedelta(hours=i)
+        market_data.append(
+            {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "price_per_kwh": 5.0 if i == 12 else 10.0,
+            }
+        )
+
+    hass.states.async_set("sensor.epex_spot_price", "5.0", {"data": market_data})
+
+    config_entry = MockConfigEntry(
+        domain="epex_spot_sensor",
+        title="Test Sensor",
+        options={
+            CONF_ENTITY_ID: "sensor.epex_spot_price",
+            CONF_EARLIEST_START_TIME: "00:00:00",
+            CONF_LATEST_END_TIME: "23:59:59",
+            CONF_DURATION: {"hours": 1},
+            CONF_INTERVAL_MODE: IntervalModes.CONTIGUOUS.value,
+            CONF_PRICE_MODE: PriceModes.CHEAPEST.value,
+        },
+    )
+    config_entry.add_to_hass(hass)
+
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert hass.states.get("binary_sensor.test_sensor").state == "on"
+
+    with patch.object(
+        BinarySensor,
+        "_calculate_duration",
+        autospec=True,
+        side_effect=BinarySensor._calculate_duration,
+    ) as mock_duration:
+        # the interval ends
+        future = now + timedelta(hours=1)
+        freezer.move_to(future)
+        async_fire_time_changed(hass, future)
+        await hass.async_block_till_done()
+
+        assert mock_duration.call_count == 0
+        assert hass.states.get("binary_sensor.test_sensor").state == "off"
+
+        # the window ends
+        future = now.replace(hour=23, minute=59, second=59)
+        freezer.move_to(future)
+        async_fire_time_changed(hass, future)
+        await hass.async_block_till_done()
+
+        assert mock_duration.call_count == 1
@@ -6,7 +6,12 @@ from custom_components.epex_spot_sensor import config_flow
 from custom_components.epex_spot_sensor.const import (
     CONF_DURATION_MODE,
     CONF_MIN_DURATION,
+    CONF_FLEXIBLE_OBJECTIVE,
     CONF_PRICE_TOLERANCE,
+    CONF_MIN_RUN_LENGTH,
+    CONF_MAX_SEGMENTS,
+    CONF_RECORD_FULL_HISTORY,
+    CONF_UPDATE_DELAY,
 )
 
 
@@ -27,6 +32,12 @@ class TestFlexibleDurationConfig:
         # Check that min_duration field exists (now always present as optional)
         assert CONF_MIN_DURATION in schema.schema
 
+    def test_flexible_objective_field_exists(self):
+        """Test that flexible_objective field exists in options schema."""
+        schema = config_flow.OPTIONS_SCHEMA
+
+        assert CONF_FLEXIBLE_OBJECTIVE in schema.schema
+
     def test_price_tolerance_field_exists(self):
         """Test that price_tolerance field exists (Phase 1 - should pass)."""
         schema = config_flow.OPTIONS_SCHEMA
@@ -72,3 +83,32 @@ class TestFlexibleDurationConfig:
         # This should work
         result = schema(config_data)
         assert result is not None
+
+    def test_run_constraint_fields_exist(self):
+        """Test that min_run_length and max_segments fields exist."""
+        schema = config_flow.OPTIONS_SCHEMA
+
+        assert CONF_MIN_RUN_LENGTH in schema.schema
+        assert CONF_MAX_SEGMENTS in schema.schema
+
+    def test_record_full_history_field_exists(self):
+        """Test that record_full_history field exists and defaults to off."""
+        schema = config_flow.OPTIONS_SCHEMA
+
+        assert CONF_RECORD_FULL_HISTORY in schema.schema
+
+        result = schema(
+            {
+                "earliest_start_time": "22:00:00",
+                "latest_end_time": "06:00:00",
+                "price_mode": "cheapest",
+                "interval_mode": "intermittent",
+            }
+        )
+        assert result[CONF_RECORD_FULL_HISTORY] is False
+
+    def test_update_delay_field_exists(self):
+        """Test that update_delay field exists."""
+        schema = config_flow.OPTIONS_SCHEMA
+
+        assert CONF_UPDATE_DELAY in schema.schema
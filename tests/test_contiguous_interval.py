@@ -104,9 +104,12 @@ def test_calc_interval_for_contiguous_crossing_midnight():
 
 
 def test_calc_interval_price_missing_data():
-    """Test _calc_interval_price with missing market data (repro for PR #45)."""
-    from custom_components.epex_spot_sensor.contiguous_interval import (
-        _calc_interval_price,
+    """Test the interval price with missing market data (repro for PR #45)."""
+    from custom_components.epex_spot_sensor.contiguous_interval import _PriceIndex
+    from custom_components.epex_spot_sensor.util import (
+        ONE_MICROSECOND,
+        marketdata_to_epoch_us,
+        to_epoch_us,
     )
 
     # Scenario: Request calculation for a duration where part of the data is missing.
@@ -119,7 +122,144 @@ def test_calc_interval_price_missing_data():
 
     duration = timedelta(hours=2)
 
-    # This should return None (gracefully handle missing data), but currently raises AttributeError
-    # because _calc_interval_price tries to access .end_time on None result from _find_market_price
-    price = _calc_interval_price(marketdata, start_time, duration)
+    # This should return None (gracefully handle missing data)
+    price_index = _PriceIndex(*marketdata_to_epoch_us(marketdata))
+    price = price_index.interval_price(
+        to_epoch_us(start_time), duration // ONE_MICROSECOND
+    )
     assert price is None
+
+
+def test_price_index_matches_minute_walk():
+    """Test _PriceIndex against a minute by minute sum for partial slots and gaps."""
+    from custom_components.epex_spot_sensor.contiguous_interval import _PriceIndex
+    from custom_components.epex_spot_sensor.util import (
+        ONE_MICROSECOND,
+        marketdata_to_epoch_us,
+        to_epoch_us,
+    )
+
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(minutes=15 * i),
+            start + timedelta(minutes=15 * (i + 1)),
+            price,
+        )
+        for i, price in enumerate([8, 3, 12, 7, 1, 9])
+    ]
+    # gap between 01:30 and 02:00
+    marketdata.append(
+        MockMarketPrice(
+            start + timedelta(hours=2), start + timedelta(hours=2, minutes=15), 4
+        )
+    )
+    price_index = _PriceIndex(*marketdata_to_epoch_us(marketdata))
+
+    def minute_price(time):
+        for mp in marketdata:
+            if mp.start_time <= time < mp.end_time:
+                return mp.price / 60
+        return None
+
+    for offset in range(0, 135, 5):
+        for length in range(5, 60, 5):
+            start_time = start + timedelta(minutes=offset)
+            duration = timedelta(minutes=length)
+            minute_prices = [
+                minute_price(start_time + timedelta(minutes=m)) for m in range(length)
+            ]
+            price = price_index.interval_price(
+                to_epoch_us(start_time), duration // ONE_MICROSECOND
+            )
+            if None in minute_prices:
+                assert price is None
+            else:
+                assert abs(price - sum(minute_prices)) < 1e-9
+
+
+def test_price_index_sliding_window_matches_lookup():
+    """Test the two-pointer walk against the per-window bisect lookup."""
+    from custom_components.epex_spot_sensor.contiguous_interval import (
+        _iter_start_times,
+        _PriceIndex,
+    )
+    from custom_components.epex_spot_sensor.util import (
+        ONE_MICROSECOND,
+        marketdata_to_epoch_us,
+        to_epoch_us,
+    )
+
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(minutes=15 * i),
+            start + timedelta(minutes=15 * (i + 1)),
+            price,
+        )
+        for i, price in enumerate([8, 3, 12, 7, 1, 9, 4, 4, 6, 2, 11, 5])
+    ]
+    slot_start_times, slot_end_times, prices = marketdata_to_epoch_us(marketdata)
+    price_index = _PriceIndex(slot_start_times, slot_end_times, prices)
+    duration = timedelta(minutes=50) // ONE_MICROSECOND
+    start_times = list(
+        _iter_start_times(
+            slot_start_times,
+            slot_end_times,
+            earliest_start=to_epoch_us(start + timedelta(minutes=5)),
+            latest_end=to_epoch_us(start + timedelta(hours=3)),
+            duration=duration,
+        )
+    )
+
+    walked = list(price_index.iter_interval_prices(start_times, duration))
+
+    assert [s for s, _ in walked] == start_times
+    for start_time, price in walked:
+        assert price == price_index.interval_price(start_time, duration)
+
+
+def test_start_times_match_reference_set():
+    """Test the merged start time stream against the set based definition."""
+    from custom_components.epex_spot_sensor.contiguous_interval import (
+        _iter_flexible_start_times,
+        _iter_start_times,
+    )
+
+    # irregular slots with a gap, in plain integers
+    slot_start_times = [0, 10, 25, 30, 60, 75, 90]
+    slot_end_times = [10, 25, 30, 45, 75, 90, 120]
+
+    def reference(earliest_start, latest_end, duration):
+        start_times = set()
+        if earliest_start + duration <= latest_end:
+            start_times.add(earliest_start)
+            start_times.add(latest_end - duration)
+        for slot_start, slot_end in zip(slot_start_times, slot_end_times):
+            if earliest_start <= slot_start and slot_start + duration <= latest_end:
+                start_times.add(slot_start)
+            if earliest_start <= slot_end - duration and slot_end <= latest_end:
+                start_times.add(slot_end - duration)
+        return sorted(start_times)
+
+    for earliest_start in range(0, 60, 7):
+        for latest_end in range(earliest_start, 121, 11):
+            for duration in (5, 15, 40):
+                assert list(
+                    _iter_start_times(
+                        slot_start_times,
+                        slot_end_times,
+                        earliest_start,
+                        latest_end,
+                        duration,
+                    )
+                ) == reference(earliest_start, latest_end, duration)
+
+            assert list(
+                _iter_flexible_start_times(
+                    slot_start_times, slot_end_times, earliest_start, latest_end, 5, 40
+                )
+            ) == sorted(
+                set(reference(earliest_start, latest_end, 5))
+                | set(reference(earliest_start, latest_end, 40))
+            )
@@ -138,3 +138,31 @@ def test_flexible_duration_most_expensive():
     assert result["start"] == start + timedelta(hours=2)
     assert result["end"] == start + timedelta(hours=3)
     assert result["interval_price"] == 20
+
+
+def test_flexible_duration_intermediate_optimum():
+    """Test flexible duration finds an optimum between min and max duration."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(hours=i), start + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate([4, 1, 4, 1, 4, 10])
+    ]
+
+    # Min 2 hours, max 4 hours: best 2h and 4h windows average 2.5 per hour,
+    # the 3 hour window 01:00-04:00 averages 2 per hour
+    result = calc_interval_for_contiguous(
+        marketdata,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=6),
+        duration=timedelta(hours=4),
+        most_expensive=False,
+        min_duration=timedelta(hours=2),
+    )
+
+    assert result is not None
+    assert result["start"] == start + timedelta(hours=1)
+    assert result["end"] == start + timedelta(hours=4)
+    assert result["interval_price"] == 6
+    assert result["price_per_hour"] == 2
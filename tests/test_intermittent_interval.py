@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 from custom_components.epex_spot_sensor.intermittent_interval import (
     calc_intervals_for_intermittent,
@@ -325,3 +326,216 @@ def test_intermittent_with_2h15m_duration():
         [(i.end_time - i.start_time).total_seconds() for i in intervals]
     )
     assert total_duration == timedelta(hours=2, minutes=15).total_seconds()
+
+
+def test_iter_by_price_matches_stable_sort():
+    """Test that partial selection yields slots in stable price order."""
+    from custom_components.epex_spot_sensor.intermittent_interval import (
+        _iter_by_price,
+    )
+
+    start = datetime(2023, 10, 1, 0, 0, 0)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(minutes=15 * i),
+            start + timedelta(minutes=15 * (i + 1)),
+            price,
+        )
+        for i, price in enumerate([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7, 9])
+    ]
+
+    prices = [e.price for e in marketdata]
+    slots = range(len(marketdata))
+
+    for most_expensive in (False, True):
+        expected = sorted(slots, key=lambda i: prices[i], reverse=most_expensive)
+        assert list(_iter_by_price(prices, slots, most_expensive)) == expected
+
+    # the heap is only drained as far as needed
+    cheapest = _iter_by_price(prices, slots, False)
+    assert [prices[next(cheapest)] for _ in range(3)] == [1, 1, 2]
+
+
+def test_interval_schedule():
+    from custom_components.epex_spot_sensor.intermittent_interval import (
+        IntervalSchedule,
+    )
+
+    start = datetime(2023, 10, 1, 0, 0, 0)
+
+    def t(hours):
+        return start + timedelta(hours=hours)
+
+    # unsorted, adjacent and overlapping intervals
+    intervals = [(t(5), t(6)), (t(1), t(2)), (t(2), t(3)), (t(5.5), t(7))]
+    schedule = IntervalSchedule(intervals)
+    assert list(schedule) == [(t(1), t(3)), (t(5), t(7))]
+
+    def is_in_intervals(now):
+        return any(s <= now < e for s, e in intervals)
+
+    for hours in [0, 1, 1.5, 2, 3, 4, 5, 6.5, 7, 8, 2.5, 0.5, 5]:
+        assert schedule.is_on(t(hours)) == is_in_intervals(t(hours))
+
+    assert schedule.next_transition(t(0)) == t(1)
+    assert schedule.next_transition(t(2)) == t(3)
+    assert schedule.next_transition(t(3)) == t(5)
+    assert schedule.next_transition(t(6)) == t(7)
+    assert schedule.next_transition(t(7)) is None
+    assert schedule.next_transition(t(1)) == t(3)
+
+
+def test_intermittent_with_min_run_length_and_max_segments():
+    start = datetime(2023, 10, 1, 0, 0, 0)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(minutes=15 * i),
+            start + timedelta(minutes=15 * (i + 1)),
+            price,
+        )
+        for i, price in enumerate([1, 9, 2, 9, 3, 9, 3, 5, 5, 9, 9, 9])
+    ]
+
+    def calc(**kwargs):
+        intervals = calc_intervals_for_intermittent(
+            marketdata,
+            earliest_start=start,
+            latest_end=start + timedelta(hours=3),
+            duration=timedelta(hours=1),
+            most_expensive=False,
+            **kwargs,
+        )
+        return sorted((i.start_time, i.end_time) for i in intervals)
+
+    def t(minutes):
+        return start + timedelta(minutes=minutes)
+
+    # the four cheapest slots are scattered
+    assert len(calc()) == 4
+
+    # at least 30 minutes on
+    assert calc(min_run_length=timedelta(minutes=30)) == [
+        (t(0), t(15)),
+        (t(15), t(30)),
+        (t(90), t(105)),
+        (t(105), t(120)),
+    ]
+
+    # a single interval
+    assert calc(max_segments=1) == [
+        (t(60), t(75)),
+        (t(75), t(90)),
+        (t(90), t(105)),
+        (t(105), t(120)),
+    ]
+
+    # intervals are ranked by price
+    intervals = calc_intervals_for_intermittent(
+        marketdata,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=3),
+        duration=timedelta(hours=1),
+        max_segments=2,
+    )
+    assert [i.price * 4 for i in intervals] == [1, 3, 5, 5]
+    assert [i.rank for i in intervals] == [0, 1, 2, 3]
+
+    # not enough slots for a run of 4 hours
+    assert (
+        calc_intervals_for_intermittent(
+            marketdata,
+            earliest_start=start,
+            latest_end=start + timedelta(hours=3),
+            duration=timedelta(hours=4),
+            min_run_length=timedelta(hours=1),
+        )
+        is None
+    )
+
+
+def test_intermittent_run_constraints_with_unaligned_duration():
+    start = datetime(2023, 10, 1, 0, 0, 0)
+
+    def t(hours):
+        return start + timedelta(hours=hours)
+
+    marketdata = [
+        MockMarketPrice(t(i), t(i + 1), price)
+        for i, price in enumerate([8, 1, 2, 9, 9, 3, 9])
+    ]
+
+    # the remainder of 20 minutes extends the run into the cheaper neighbour
+    intervals = calc_intervals_for_intermittent(
+        marketdata,
+        earliest_start=start,
+        latest_end=t(7),
+        duration=timedelta(hours=2, minutes=20),
+        min_run_length=timedelta(hours=1),
+        max_segments=1,
+    )
+    assert sorted((i.start_time, i.end_time) for i in intervals) == [
+        (start + timedelta(minutes=40), t(1)),
+        (t(1), t(2)),
+        (t(2), t(3)),
+    ]
+
+    # durations off the slot grid don't subdivide two days of slots into
+    # microseconds
+    marketdata = [MockMarketPrice(t(i), t(i + 1), (i * 7) % 11) for i in range(48)]
+    for duration in [
+        timedelta(hours=2.33),
+        timedelta(hours=2.0001),
+        timedelta(hours=6, seconds=1),
+    ]:
+        started = time.perf_counter()
+        intervals = calc_intervals_for_intermittent(
+            marketdata,
+            earliest_start=start,
+            latest_end=t(48),
+            duration=duration,
+            min_run_length=timedelta(hours=1),
+            max_segments=3,
+        )
+        assert time.perf_counter() - started < 1
+
+        intervals = sorted((i.start_time, i.end_time) for i in intervals)
+        assert sum((end - begin for begin, end in intervals), timedelta()) == duration
+        runs = []
+        for begin, end in intervals:
+            if runs and runs[-1][1] == begin:
+                runs[-1][1] = end
+            else:
+                runs.append([begin, end])
+        assert len(runs) <= 3
+        assert all(end - begin >= timedelta(hours=1) for begin, end in runs)
+
+
+def test_coalesce_intervals():
+    from custom_components.epex_spot_sensor.intermittent_interval import (
+        Interval,
+        coalesce_intervals,
+    )
+
+    start = datetime(2023, 10, 1, 0, 0, 0)
+
+    def t(minutes):
+        return start + timedelta(minutes=minutes)
+
+    # 15 minute intervals ordered by rank
+    intervals = [
+        Interval(t(45), t(60), 0.5, 0),
+        Interval(t(0), t(15), 1.0, 1),
+        Interval(t(30), t(45), 1.5, 2),
+        Interval(t(15), t(30), 2.0, 3),
+        Interval(t(90), t(105), 3.0, 4),
+    ]
+
+    runs = coalesce_intervals(intervals)
+
+    assert [(e.start_time, e.end_time) for e in runs] == [
+        (t(0), t(60)),
+        (t(90), t(105)),
+    ]
+    assert [e.ranks for e in runs] == [[1, 3, 2, 0], [4]]
+    assert [e.rank for e in runs] == [0, 4]
+    assert [e.average_price for e in runs] == [5.0, 12.0]
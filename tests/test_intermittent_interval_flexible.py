@@ -211,3 +211,62 @@ def test_edge_case_insufficient_after_filter():
 
     # Should return None because cannot meet min_duration
     assert intervals is None
+
+
+def test_flexible_objectives():
+    """Test choosing the duration by average price or total cost."""
+    start = datetime(2023, 10, 1, 0, 0, 0)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(hours=i), start + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate([3, -2, 5, -1, 0])
+    ]
+
+    def calc(most_expensive=False, **kwargs):
+        intervals = calc_intervals_for_intermittent(
+            marketdata,
+            earliest_start=start,
+            latest_end=start + timedelta(hours=5),
+            duration=timedelta(hours=4),
+            most_expensive=most_expensive,
+            min_duration=timedelta(hours=1),
+            **kwargs,
+        )
+        return sorted(i.price for i in intervals)
+
+    # the best average price is the one of the cheapest hour
+    assert calc() == [-2.0]
+    assert calc(objective="average_price") == [-2.0]
+
+    # all hours with negative or zero price reduce the total cost
+    assert calc(objective="total_cost") == [-2.0, -1.0, 0.0]
+
+    # most expensive: all hours with positive or zero price
+    assert calc(most_expensive=True, objective="total_cost") == [0.0, 3.0, 5.0]
+    assert calc(most_expensive=True) == [5.0]
+
+
+def test_flexible_min_duration_within_slot():
+    """Test that a minimum duration ending within a slot is a candidate."""
+    start = datetime(2023, 10, 1, 0, 0, 0)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(hours=i), start + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate([10, 20, 30, 40])
+    ]
+
+    for objective in ["average_price", "total_cost"]:
+        intervals = calc_intervals_for_intermittent(
+            marketdata,
+            earliest_start=start,
+            latest_end=start + timedelta(hours=4),
+            duration=timedelta(hours=3),
+            min_duration=timedelta(hours=1, minutes=30),
+            objective=objective,
+        )
+        assert sorted((i.start_time, i.end_time) for i in intervals) == [
+            (start, start + timedelta(hours=1)),
+            (start + timedelta(hours=1), start + timedelta(hours=1, minutes=30)),
+        ]
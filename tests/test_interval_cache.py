@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+from custom_components.epex_spot_sensor.contiguous_interval import (
+    calc_interval_for_contiguous,
+)
+from custom_components.epex_spot_sensor.interval_cache import IntervalCache
+from custom_components.epex_spot_sensor.util import MarketTimeline
+
+
+class MockMarketPrice:
+    def __init__(self, start_time, end_time, price):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.price = price
+        self.price_uom = "ct/kWh"
+
+
+START = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+
+
+def _marketdata(prices):
+    return [
+        MockMarketPrice(
+            START + timedelta(hours=i), START + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate(prices)
+    ]
+
+
+def _calc(cache, marketdata, duration):
+    return cache.calc(
+        calc_interval_for_contiguous,
+        marketdata,
+        earliest_start=START,
+        latest_end=START + timedelta(hours=4),
+        duration=duration,
+        most_expensive=False,
+    )
+
+
+def test_cache_hits_for_equal_timelines():
+    """Test that equal timelines and parameters share one calculation."""
+    cache = IntervalCache()
+
+    timeline = MarketTimeline(_marketdata([10, 5, 20, 10]))
+    result = _calc(cache, timeline, timedelta(hours=1))
+    assert result["start"] == START + timedelta(hours=1)
+    assert cache.cache_info().misses == 1
+
+    # another timeline object with the same content
+    timeline = MarketTimeline(_marketdata([10, 5, 20, 10]))
+    assert _calc(cache, timeline, timedelta(hours=1)) is result
+    assert cache.cache_info().hits == 1
+
+    # other parameters or other data are calculated again
+    _calc(cache, timeline, timedelta(hours=2))
+    _calc(cache, MarketTimeline(_marketdata([10, 5, 2, 10])), timedelta(hours=1))
+    assert cache.cache_info() == (1, 3, 128, 3)
+
+
+def test_cache_is_bounded():
+    """Test that the least recently used result is evicted."""
+    cache = IntervalCache(maxsize=2)
+    timeline = MarketTimeline(_marketdata([10, 5, 20, 10]))
+
+    _calc(cache, timeline, timedelta(hours=1))
+    _calc(cache, timeline, timedelta(hours=2))
+    _calc(cache, timeline, timedelta(hours=1))
+    _calc(cache, timeline, timedelta(hours=3))
+    assert cache.cache_info() == (1, 3, 2, 2)
+
+    # 2 hours was evicted, 1 hour is still cached
+    _calc(cache, timeline, timedelta(hours=1))
+    _calc(cache, timeline, timedelta(hours=2))
+    assert cache.cache_info() == (2, 4, 2, 2)
+
+
+def test_cache_bypasses_plain_lists():
+    """Test that market data without fingerprint is not cached."""
+    cache = IntervalCache()
+    marketdata = _marketdata([10, 5, 20, 10])
+
+    assert _calc(cache, marketdata, timedelta(hours=1)) is not _calc(
+        cache, marketdata, timedelta(hours=1)
+    )
+    assert cache.cache_info() == (0, 0, 128, 0)
+
+
+def test_cache_stores_external_results():
+    """Test storing results calculated outside of the cache."""
+    cache = IntervalCache()
+    timeline = MarketTimeline(_marketdata([10, 5, 20, 10]))
+    kwargs = {
+        "earliest_start": START,
+        "latest_end": START + timedelta(hours=4),
+        "duration": timedelta(hours=1),
+        "most_expensive": False,
+    }
+
+    assert not cache.contains(calc_interval_for_contiguous, timeline, **kwargs)
+
+    result = calc_interval_for_contiguous(timeline, **kwargs)
+    cache.store(result, calc_interval_for_contiguous, timeline, **kwargs)
+
+    assert cache.contains(calc_interval_for_contiguous, timeline, **kwargs)
+    assert _calc(cache, timeline, timedelta(hours=1)) is result
+    assert cache.cache_info() == (1, 0, 128, 1)
+
+    # plain lists are never cached
+    marketdata = _marketdata([10, 5, 20, 10])
+    cache.store(result, calc_interval_for_contiguous, marketdata, **kwargs)
+    assert not cache.contains(calc_interval_for_contiguous, marketdata, **kwargs)
@@ -0,0 +1,121 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from custom_components.epex_spot_sensor.contiguous_interval import (
+    calc_interval_for_contiguous,
+)
+from custom_components.epex_spot_sensor.util import (
+    MarketdataStore,
+    MarketTimeline,
+    SlotLocator,
+)
+
+
+class MockMarketPrice:
+    def __init__(self, start_time, end_time, price):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.price = price
+        self.price_uom = "ct/kWh"
+
+
+def _marketdata(start, prices):
+    return [
+        MockMarketPrice(
+            start + timedelta(hours=i), start + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate(prices)
+    ]
+
+
+def test_timeline_stores_raw_numbers():
+    """Test that the timeline stores epoch seconds and float prices."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    timeline = MarketTimeline(_marketdata(start, [10, 5.5, 20]))
+
+    assert len(timeline) == 3
+    assert list(timeline.start_timestamps) == [
+        int((start + timedelta(hours=i)).timestamp()) for i in range(3)
+    ]
+    assert list(timeline.end_timestamps) == [
+        int((start + timedelta(hours=i + 1)).timestamp()) for i in range(3)
+    ]
+    assert list(timeline.prices) == [10.0, 5.5, 20.0]
+
+
+def test_timeline_views_are_compatible():
+    """Test that timeline entries behave like Marketprice objects."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = _marketdata(start, [10, 5, 20, 10])
+    timeline = MarketTimeline(marketdata)
+
+    assert timeline[-1].end_time == start + timedelta(hours=4)
+    for view, mp in zip(timeline, marketdata):
+        assert view.start_time == mp.start_time
+        assert view.end_time == mp.end_time
+        assert view.price == mp.price
+        assert view.price_uom == "ct/kWh"
+
+    result = calc_interval_for_contiguous(
+        timeline,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=4),
+        duration=timedelta(hours=1),
+        most_expensive=False,
+    )
+    assert result == calc_interval_for_contiguous(
+        marketdata,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=4),
+        duration=timedelta(hours=1),
+        most_expensive=False,
+    )
+
+
+def test_store_appends_overwrites_and_evicts():
+    """Test merging new, duplicate and outdated entries into the store."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    store = MarketdataStore()
+
+    store.merge(_marketdata(start, [10, 5, 20, 10]))
+    snapshot = store.timeline()
+
+    # 02:00-03:00 is published again with another price, 04:00-06:00 is new
+    store.merge(_marketdata(start + timedelta(hours=2), [15, 10, 7, 8]))
+    assert list(store.timeline().prices) == [10, 5, 15, 10, 7, 8]
+
+    # entries older than the tail which are unknown are ignored
+    store.merge(_marketdata(start - timedelta(hours=1), [1]))
+    assert len(store) == 6
+
+    store.evict(start + timedelta(hours=3))
+    timeline = store.timeline()
+    assert [e.start_time for e in timeline] == [
+        start + timedelta(hours=i) for i in range(3, 6)
+    ]
+    assert list(timeline.prices) == [10, 7, 8]
+
+    # snapshots are not affected by later changes
+    assert list(snapshot.prices) == [10, 5, 20, 10]
+
+
+def test_timeline_detects_uniform_grid():
+    """Test grid detection and slot lookup with and without grid."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = _marketdata(start, [10, 5, 20, 7])
+    timeline = MarketTimeline(marketdata)
+    assert timeline.step == 3600
+
+    # gap between 02:00 and 03:00
+    irregular = MarketTimeline([*marketdata[:2], *marketdata[3:]])
+    assert irregular.step is None
+
+    for t in (timeline, irregular):
+        starts = list(t.start_timestamps)
+        ends = list(t.end_timestamps)
+        grid = SlotLocator(starts, ends, t.step)
+        for ts in range(starts[0] - 5400, ends[-1] + 5400, 900):
+            assert grid.start_left(ts) == bisect_left(starts, ts)
+            assert grid.start_right(ts) == bisect_right(starts, ts)
+            assert grid.end_left(ts) == bisect_left(ends, ts)
+            assert grid.end_right(ts) == bisect_right(ends, ts)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.epex_spot_sensor.const import DOMAIN
+from custom_components.epex_spot_sensor.marketdata_hub import (
+    MarketdataSource,
+    async_get_marketdata_hub,
+)
+from custom_components.epex_spot_sensor.util import MarketTimeline
+
+
+def _market_data(start, prices):
+    return [
+        {
+            "start_time": (start + timedelta(hours=i)).isoformat(),
+            "end_time": (start + timedelta(hours=i + 1)).isoformat(),
+            "price_per_kwh": price,
+        }
+        for i, price in enumerate(prices)
+    ]
+
+
+def test_source_parses_data_once():
+    """Test that unchanged data is returned without parsing it again."""
+    start = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    attributes = {"data": _market_data(start, [10, 5, 20])}
+    source = MarketdataSource("sensor.epex_spot_price")
+
+    marketdata = source.get_marketdata(attributes)
+
+    assert isinstance(marketdata, MarketTimeline)
+    assert [e.price for e in marketdata] == [10, 5, 20]
+    assert source.get_marketdata(attributes) is marketdata
+
+
+def test_source_skips_equal_data():
+    """Test that a copy of unchanged data is not parsed again."""
+    start = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    source = MarketdataSource("sensor.epex_spot_price")
+
+    marketdata = source.get_marketdata({"data": _market_data(start, [10, 5, 20])})
+    fingerprint = source.fingerprint
+
+    assert source.get_marketdata({"data": _market_data(start, [10, 5, 20])}) is (
+        marketdata
+    )
+    assert source.fingerprint == fingerprint
+
+    changed = source.get_marketdata({"data": _market_data(start, [10, 6, 20])})
+    assert changed is not marketdata
+    assert source.fingerprint != fingerprint
+
+
+def test_source_merges_and_evicts():
+    """Test that new data is merged with cached data and outdated is dropped."""
+    start = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    source = MarketdataSource("sensor.epex_spot_price")
+
+    source.get_marketdata({"data": _market_data(start - timedelta(days=2), [1])})
+    source.get_marketdata({"data": _market_data(start, [10, 5])})
+    marketdata = source.get_marketdata(
+        {"data": _market_data(start + timedelta(hours=1), [6, 7])}
+    )
+
+    assert [e.start_time for e in marketdata] == [
+        start + timedelta(hours=i) for i in range(3)
+    ]
+    assert [e.price for e in marketdata] == [10, 6, 7]
+
+
+async def test_hub_shares_sources(hass):
+    """Test that sensors with the same price sensor share one source."""
+    hub = async_get_marketdata_hub(hass)
+    assert hass.data[DOMAIN] is hub
+    assert async_get_marketdata_hub(hass) is hub
+
+    unsub1 = hub.async_subscribe("sensor.epex_spot_price")
+    unsub2 = hub.async_subscribe("sensor.epex_spot_price")
+    source = hub.get_source("sensor.epex_spot_price")
+
+    unsub1()
+    assert hub.get_source("sensor.epex_spot_price") is source
+
+    unsub2()
+    assert hub.get_source("sensor.epex_spot_price") is not source
@@ -2,6 +2,7 @@
 
 from datetime import datetime, timedelta, timezone
 from custom_components.epex_spot_sensor.contiguous_interval import (
+    calc_candidate_intervals_for_contiguous,
     calc_interval_for_contiguous,
 )
 
@@ -355,3 +356,42 @@ def test_tolerance_with_earliest_start_constraint():
     assert result is not None
     assert result["start"] == start + timedelta(hours=3)
     assert result["interval_price"] == 12
+
+
+def test_candidate_table_ranks_alternatives():
+    """Test that the candidate table ranks all alternatives by price."""
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = [
+        MockMarketPrice(
+            start + timedelta(hours=i), start + timedelta(hours=i + 1), price
+        )
+        for i, price in enumerate([11, 12, 10, 11, 12])
+    ]
+
+    candidates = calc_candidate_intervals_for_contiguous(
+        marketdata,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=5),
+        duration=timedelta(hours=1),
+        most_expensive=False,
+    )
+
+    assert [c["start"] for c in candidates] == [
+        start + timedelta(hours=2),
+        start,
+        start + timedelta(hours=3),
+        start + timedelta(hours=1),
+        start + timedelta(hours=4),
+    ]
+    assert [c["price_per_hour"] for c in candidates] == [10, 11, 11, 12, 12]
+
+    # the selected interval with tolerance is one of the ranked candidates
+    result = calc_interval_for_contiguous(
+        marketdata,
+        earliest_start=start,
+        latest_end=start + timedelta(hours=5),
+        duration=timedelta(hours=1),
+        most_expensive=False,
+        price_tolerance_percent=20.0,
+    )
+    assert result == candidates[1]
@@ -0,0 +1,120 @@
+"""Test the optional NumPy backend against the pure-Python engines."""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from custom_components.epex_spot_sensor import vectorized
+from custom_components.epex_spot_sensor.contiguous_interval import (
+    calc_interval_for_contiguous,
+)
+from custom_components.epex_spot_sensor.intermittent_interval import (
+    calc_intervals_for_intermittent,
+)
+
+
+class MockMarketPrice:
+    def __init__(self, start_time, end_time, price):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.price = price
+
+
+def _random_marketdata(rng, start, count):
+    """Create quarter-hour market data with repeated prices and a gap."""
+    marketdata = []
+    time = start
+    for i in range(count):
+        if i == count // 2:
+            time += timedelta(minutes=15)
+        marketdata.append(
+            MockMarketPrice(time, time + timedelta(minutes=15), rng.randint(-5, 30))
+        )
+        time += timedelta(minutes=15)
+    return marketdata
+
+
+def _as_tuples(intervals):
+    return [(i.start_time, i.end_time, i.price, i.rank) for i in intervals]
+
+
+def test_is_enabled_without_numpy(monkeypatch):
+    """Test that the pure-Python engines are used without NumPy."""
+    monkeypatch.setattr(vectorized, "np", None)
+
+    assert not vectorized.is_enabled(vectorized.MIN_SLOTS * 10)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_matches_pure_python(monkeypatch, seed):
+    """Test that both backends select identical intervals."""
+    pytest.importorskip("numpy")
+
+    rng = random.Random(seed)
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = _random_marketdata(rng, start, 300)
+
+    for _ in range(20):
+        earliest_start = start + timedelta(minutes=rng.randint(0, 600))
+        latest_end = earliest_start + timedelta(minutes=rng.randint(60, 3000))
+        duration = timedelta(minutes=rng.randint(1, 600))
+        most_expensive = rng.random() < 0.5
+        price_tolerance_percent = rng.choice([0.0, 10.0])
+        min_duration = duration / 2 if rng.random() < 0.5 else None
+
+        results = []
+        for min_slots in (0, 10**9):
+            monkeypatch.setattr(vectorized, "MIN_SLOTS", min_slots)
+            contiguous = calc_interval_for_contiguous(
+                marketdata,
+                earliest_start=earliest_start,
+                latest_end=latest_end,
+                duration=duration,
+                most_expensive=most_expensive,
+                price_tolerance_percent=price_tolerance_percent,
+            )
+            intermittent = calc_intervals_for_intermittent(
+                marketdata,
+                earliest_start=earliest_start,
+                latest_end=latest_end,
+                duration=duration,
+                most_expensive=most_expensive,
+                min_duration=min_duration,
+            )
+            results.append((contiguous, intermittent and _as_tuples(intermittent)))
+
+        assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_vectorized_run_constraints_match_pure_python(monkeypatch, seed):
+    """Test that both backends select identical intervals with run constraints."""
+    pytest.importorskip("numpy")
+
+    rng = random.Random(seed)
+    start = datetime(2023, 10, 1, 0, 0, 0, tzinfo=timezone.utc)
+    marketdata = _random_marketdata(rng, start, 96)
+
+    for _ in range(10):
+        earliest_start = start + timedelta(minutes=rng.randint(0, 300))
+        latest_end = earliest_start + timedelta(minutes=rng.randint(60, 1200))
+        duration = timedelta(minutes=rng.randint(1, 300))
+        most_expensive = rng.random() < 0.5
+        min_run_length = timedelta(minutes=rng.choice([0, 20, 30, 45, 60]))
+        max_segments = rng.choice([0, 1, 3, 6])
+
+        results = []
+        for min_states in (0, 10**9):
+            monkeypatch.setattr(vectorized, "MIN_STATES", min_states)
+            intervals = calc_intervals_for_intermittent(
+                marketdata,
+                earliest_start=earliest_start,
+                latest_end=latest_end,
+                duration=duration,
+                most_expensive=most_expensive,
+                min_run_length=min_run_length,
+                max_segments=max_segments,
+            )
+            results.append(intervals and _as_tuples(intervals))
+
+        assert results[0] == results[1]